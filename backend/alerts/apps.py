@@ -5,3 +5,6 @@ class AlertsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'alerts'
 
+    def ready(self):
+        from . import signals  # noqa: F401
+
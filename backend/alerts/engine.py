@@ -0,0 +1,234 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from django.conf import settings
+from stocks.redis_client import get_redis
+from .models import Alert
+
+CHANGES_KEY = 'alerts:engine:changes'
+
+# Alert types that fire when the tick value falls to the target; the rest
+# fire when it rises to it
+FALLING = ('price_below',)
+
+
+def _key(alert_type, target):
+    """Sort key that puts the alerts a tick crosses at the end of their list.
+
+    Falling alerts fire for targets >= the value and keep their target;
+    rising alerts fire for targets <= the value, so they are stored negated,
+    i.e. in descending target order.
+    """
+    return target if alert_type in FALLING else -target
+
+
+class Thresholds:
+    """Alerts of one type on one stock, sorted by ``_key``.
+
+    ``keys`` and ``ids`` are parallel lists. The alerts a value crosses are
+    always a suffix, found by bisection and removed from the end, so firing
+    never shifts the alerts that remain.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.ids = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, key, alert_id):
+        index = bisect_right(self.keys, key)
+        self.keys.insert(index, key)
+        self.ids.insert(index, alert_id)
+
+    def remove(self, key, alert_id):
+        index = bisect_left(self.keys, key)
+        while index < len(self.ids) and self.keys[index] == key:
+            if self.ids[index] == alert_id:
+                del self.keys[index]
+                del self.ids[index]
+                return
+            index += 1
+
+    def pop_from(self, key):
+        """Remove and return the ids of alerts with a key >= ``key``"""
+        index = bisect_left(self.keys, key)
+        ids = self.ids[index:]
+        del self.keys[index:]
+        del self.ids[index:]
+        return ids
+
+
+class AlertEngine:
+    """Process-local index of active alerts, evaluated against incoming ticks.
+
+    Active alerts are loaded with one query and kept per stock and type in
+    ``Thresholds``, so a tick costs O(log A + fired) whatever the number of
+    alerts. Alert signals append each change to a Redis stream; every
+    process applies the stream at most every ``sync_interval`` seconds and
+    reloads from the database if it fell behind the stream's trimmed tail.
+
+    Fired alerts leave the index immediately, so a tick never fires an
+    alert twice in this process. They are held aside until the trigger is
+    recorded; the caller must ``restore`` any it failed to trigger.
+    """
+
+    def __init__(self, sync_interval):
+        self.sync_interval = sync_interval
+        self._index = None
+        self._alerts = {}
+        self._firing = {}
+        self._last_id = None
+        self._synced_at = 0
+        self._lock = threading.Lock()
+
+    def warm(self):
+        last = get_redis().xrevrange(CHANGES_KEY, count=1)
+        last_id = last[0][0] if last else b'0-0'
+        active = Alert.objects.filter(status='active').values_list(
+            'id', 'stock_id', 'alert_type', 'target_value'
+        )
+        alerts = {alert_id: (stock_id, alert_type, float(target)) for alert_id, stock_id, alert_type, target in active}
+        # Sort once rather than inserting alerts one by one
+        index = defaultdict(lambda: defaultdict(Thresholds))
+        for alert_id, (stock_id, alert_type, target) in sorted(alerts.items(), key=lambda item: _key(item[1][1], item[1][2])):
+            thresholds = index[stock_id][alert_type]
+            thresholds.keys.append(_key(alert_type, target))
+            thresholds.ids.append(alert_id)
+        with self._lock:
+            self._index = index
+            self._alerts = alerts
+            self._firing = {}
+            self._last_id = last_id
+            self._synced_at = time.monotonic()
+
+    def _add(self, alert_id, stock_id, alert_type, target):
+        self._index[stock_id][alert_type].add(_key(alert_type, target), alert_id)
+        self._alerts[alert_id] = (stock_id, alert_type, target)
+
+    def _remove(self, alert_id):
+        self._firing.pop(alert_id, None)
+        entry = self._alerts.pop(alert_id, None)
+        if entry is None:
+            return
+        stock_id, alert_type, target = entry
+        thresholds = self._index[stock_id][alert_type]
+        thresholds.remove(_key(alert_type, target), alert_id)
+        if not thresholds:
+            del self._index[stock_id][alert_type]
+            if not self._index[stock_id]:
+                del self._index[stock_id]
+
+    def _apply(self, fields):
+        alert_id = int(fields[b'id'])
+        self._remove(alert_id)
+        if fields[b'status'] == b'active':
+            self._add(alert_id, int(fields[b'stock_id']), fields[b'alert_type'].decode(), float(fields[b'target']))
+
+    def sync(self):
+        """Apply alert changes made by any process since the last sync"""
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.xrange(CHANGES_KEY, count=1)
+        pipe.xrange(CHANGES_KEY, min=f'({self._last_id.decode()}')
+        oldest, changes = pipe.execute()
+        if oldest and _stream_id(oldest[0][0]) > _stream_id(self._last_id):
+            # Entries after our position may have been trimmed away; start over
+            self.warm()
+            return
+        with self._lock:
+            for entry_id, fields in changes:
+                self._apply(fields)
+                self._last_id = entry_id
+            self._synced_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._index is None:
+            self.warm()
+        elif time.monotonic() - self._synced_at >= self.sync_interval:
+            self.sync()
+
+    def evaluate(self, stock_id, values):
+        """Return ``[(alert_id, value), ...]`` for alerts on ``stock_id`` that ``values`` crosses.
+
+        ``values`` maps an alert type to the tick value it is compared with;
+        types missing from it are not evaluated.
+        """
+        self._ensure_fresh()
+        fired = []
+        with self._lock:
+            by_type = self._index.get(stock_id)
+            if not by_type:
+                return fired
+            for alert_type, value in values.items():
+                thresholds = by_type.get(alert_type)
+                if not thresholds or value is None:
+                    continue
+                for alert_id in thresholds.pop_from(_key(alert_type, value)):
+                    self._firing[alert_id] = self._alerts.pop(alert_id)
+                    fired.append((alert_id, value))
+        return fired
+
+    def restore(self, alert_ids):
+        """Put fired alerts back in the index, e.g. when triggering them failed"""
+        with self._lock:
+            for alert_id in alert_ids:
+                entry = self._firing.pop(alert_id, None)
+                if entry is not None and self._index is not None:
+                    self._add(alert_id, *entry)
+
+    def alert_changed(self, alert, deleted=False):
+        """Apply an Alert change locally and record it for other processes"""
+        self.alerts_changed([alert], deleted=deleted)
+
+    def alerts_changed(self, alerts, deleted=False):
+        """Apply Alert changes locally and record them in one round trip"""
+        pipe = get_redis().pipeline(transaction=False)
+        with self._lock:
+            for alert in alerts:
+                status = 'deleted' if deleted else alert.status
+                if self._index is not None:
+                    self._remove(alert.id)
+                    if status == 'active':
+                        self._add(alert.id, alert.stock_id, alert.alert_type, float(alert.target_value))
+                pipe.xadd(
+                    CHANGES_KEY,
+                    {
+                        'id': alert.id,
+                        'stock_id': alert.stock_id,
+                        'alert_type': alert.alert_type,
+                        'target': str(alert.target_value),
+                        'status': status,
+                    },
+                    maxlen=settings.ALERT_ENGINE_STREAM_SIZE,
+                    approximate=True,
+                )
+        pipe.execute()
+
+
+def _stream_id(entry_id):
+    ms, seq = entry_id.decode().split('-')
+    return int(ms), int(seq)
+
+
+def tick_values(price_data, volume_signal=None):
+    """Map each alert type to the value of a tick it is checked against.
+
+    ``volume_spike`` targets are multiples of the stock's volume baseline
+    (``stocks.volume``), so they are compared with the signal's ratio.
+    """
+    change_percent = price_data.get('change_percent')
+    return {
+        'price_above': price_data['price'],
+        'price_below': price_data['price'],
+        'price_change_percent': abs(change_percent) if change_percent is not None else None,
+        'volume_spike': volume_signal.ratio if volume_signal is not None else None,
+    }
+
+
+_alert_engine = AlertEngine(sync_interval=settings.ALERT_ENGINE_SYNC_INTERVAL)
+
+
+def get_alert_engine():
+    return _alert_engine
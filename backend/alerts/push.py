@@ -0,0 +1,45 @@
+import logging
+from stocks.broadcast import frame, group_send_many
+from stocks.groups import user_group
+
+logger = logging.getLogger(__name__)
+
+
+def alert_data(alert):
+    return {
+        'id': alert.id,
+        'stock_id': alert.stock_id,
+        'alert_type': alert.alert_type,
+        'target_value': float(alert.target_value),
+        'status': alert.status,
+    }
+
+
+def push_alert_triggered(history):
+    """Push triggered alerts to their owners' websocket connections"""
+    messages = []
+    for entry in history:
+        alert = entry.alert
+        data = alert_data(alert)
+        data.update({
+            'symbol': alert.stock.symbol,
+            'history_id': entry.id,
+            'triggered_value': float(entry.triggered_value),
+            'triggered_at': alert.triggered_at.isoformat(),
+        })
+        messages.append((user_group(alert.user_id), frame('alert_triggered', data)))
+    try:
+        group_send_many(messages)
+    except Exception as e:
+        logger.error(f"Error pushing {len(messages)} triggered alerts: {str(e)}")
+
+
+def push_alert_status(alert, status=None):
+    """Push an alert's new status (or ``'deleted'``) to its owner"""
+    data = alert_data(alert)
+    if status is not None:
+        data['status'] = status
+    try:
+        group_send_many([(user_group(alert.user_id), frame('alert_status', data))])
+    except Exception as e:
+        logger.error(f"Error pushing status of alert {alert.id}: {str(e)}")
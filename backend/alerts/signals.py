@@ -0,0 +1,33 @@
+import copy
+import logging
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .engine import get_alert_engine
+from .models import Alert
+from .push import push_alert_status
+
+logger = logging.getLogger(__name__)
+
+
+def publish_alert_change(alert, deleted=False):
+    """Record a committed Alert change for the engines and tell its owner"""
+    try:
+        get_alert_engine().alert_changed(alert, deleted=deleted)
+    except Exception as e:
+        logger.error(f"Error recording change of alert {alert.id}: {str(e)}")
+    push_alert_status(alert, status='deleted' if deleted else None)
+
+
+@receiver(post_save, sender=Alert)
+def alert_saved(sender, instance, **kwargs):
+    # The instance may change again before the transaction commits
+    alert = copy.copy(instance)
+    transaction.on_commit(lambda: publish_alert_change(alert))
+
+
+@receiver(post_delete, sender=Alert)
+def alert_deleted(sender, instance, **kwargs):
+    # delete() clears the instance's id once the signals have run
+    alert = copy.copy(instance)
+    transaction.on_commit(lambda: publish_alert_change(alert, deleted=True))
@@ -0,0 +1,44 @@
+import logging
+from celery import shared_task
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from .models import Alert, AlertHistory
+
+logger = logging.getLogger(__name__)
+
+
+def notification_message(entry):
+    alert = entry.alert
+    subject = f"{alert.stock.symbol} alert triggered: {alert.get_alert_type_display()} {alert.target_value}"
+    body = alert.message or f"{alert.stock.name} ({alert.stock.symbol}) reached {entry.triggered_value}."
+    return subject, body, settings.DEFAULT_FROM_EMAIL, [alert.user.email]
+
+
+@shared_task(bind=True, max_retries=settings.ALERT_NOTIFICATION_MAX_RETRIES)
+def send_alert_notifications(self, history_ids):
+    """Email a batch of triggered alerts over one connection and mark them notified.
+
+    A failed send is retried with exponential backoff. Entries already
+    marked as sent are skipped, but a batch that failed part way through
+    is sent again in full, so a retry may repeat some emails.
+    """
+    history = list(
+        AlertHistory.objects.filter(id__in=history_ids, notification_sent=False)
+        .select_related('alert__user', 'alert__stock')
+    )
+    deliverable = [entry for entry in history if entry.alert.user.email]
+    if not deliverable:
+        return 0
+    try:
+        send_mass_mail([notification_message(entry) for entry in deliverable], fail_silently=False)
+    except Exception as e:
+        if self.request.retries >= self.max_retries:
+            logger.error(f"Giving up on {len(deliverable)} alert notifications: {str(e)}")
+            return 0
+        logger.warning(f"Error sending {len(deliverable)} alert notifications, will retry: {str(e)}")
+        raise self.retry(exc=e, countdown=settings.ALERT_NOTIFICATION_RETRY_DELAY * 2 ** self.request.retries)
+
+    AlertHistory.objects.filter(id__in=[entry.id for entry in deliverable]).update(notification_sent=True)
+    Alert.objects.filter(id__in={entry.alert_id for entry in deliverable}).update(is_notified=True)
+    logger.info(f"Sent {len(deliverable)} alert notifications")
+    return len(deliverable)
@@ -0,0 +1,152 @@
+import time
+from collections import defaultdict
+from unittest import mock
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase
+from stocks.models import Stock
+from .engine import AlertEngine, Thresholds, _key
+from .models import Alert
+
+
+def make_engine(*alerts):
+    """An engine indexing ``(alert_id, stock_id, alert_type, target)`` without touching the database"""
+    engine = AlertEngine(sync_interval=3600)
+    engine._index = defaultdict(lambda: defaultdict(Thresholds))
+    engine._last_id = b'0-0'
+    engine._synced_at = time.monotonic()
+    for alert in alerts:
+        engine._add(*alert)
+    return engine
+
+
+class ThresholdsTests(SimpleTestCase):
+    def test_pop_from_takes_the_crossed_suffix(self):
+        thresholds = Thresholds()
+        for alert_id, target in [(1, 100), (2, 120), (3, 110), (4, 90)]:
+            thresholds.add(_key('price_above', target), alert_id)
+
+        self.assertEqual(sorted(thresholds.pop_from(_key('price_above', 110))), [1, 3, 4])
+        self.assertEqual(thresholds.ids, [2])
+
+    def test_falling_alerts_pop_targets_at_or_above_the_value(self):
+        thresholds = Thresholds()
+        for alert_id, target in [(1, 100), (2, 120), (3, 110)]:
+            thresholds.add(_key('price_below', target), alert_id)
+
+        self.assertEqual(sorted(thresholds.pop_from(_key('price_below', 110))), [2, 3])
+        self.assertEqual(thresholds.ids, [1])
+
+    def test_remove_finds_the_id_among_equal_keys(self):
+        thresholds = Thresholds()
+        for alert_id in (1, 2, 3):
+            thresholds.add(_key('price_above', 100), alert_id)
+
+        thresholds.remove(_key('price_above', 100), 2)
+
+        self.assertEqual(thresholds.ids, [1, 3])
+        self.assertEqual(len(thresholds.keys), 2)
+
+
+class AlertEngineTests(SimpleTestCase):
+    def test_evaluate_fires_crossed_alerts_once(self):
+        engine = make_engine(
+            (1, 10, 'price_above', 100.0),
+            (2, 10, 'price_above', 150.0),
+            (3, 10, 'price_below', 90.0),
+            (4, 11, 'price_above', 50.0),
+        )
+
+        fired = engine.evaluate(10, {'price_above': 120.0, 'price_below': 120.0})
+
+        self.assertEqual(fired, [(1, 120.0)])
+        self.assertEqual(engine.evaluate(10, {'price_above': 120.0}), [])
+        self.assertEqual(engine.evaluate(10, {'price_below': 85.0}), [(3, 85.0)])
+
+    def test_evaluate_skips_missing_values(self):
+        engine = make_engine((1, 10, 'volume_spike', 2.0))
+
+        self.assertEqual(engine.evaluate(10, {'volume_spike': None}), [])
+        self.assertEqual(engine.evaluate(10, {'volume_spike': 3.0}), [(1, 3.0)])
+
+    def test_restore_puts_fired_alerts_back(self):
+        engine = make_engine((1, 10, 'price_above', 100.0))
+        engine.evaluate(10, {'price_above': 120.0})
+
+        engine.restore([1])
+
+        self.assertEqual(engine.evaluate(10, {'price_above': 130.0}), [(1, 130.0)])
+
+    def test_restore_ignores_alerts_that_did_not_fire(self):
+        engine = make_engine((1, 10, 'price_above', 100.0))
+
+        engine.restore([1, 2])
+
+        self.assertEqual(engine.evaluate(10, {'price_above': 120.0}), [(1, 120.0)])
+
+    @mock.patch('alerts.engine.get_redis')
+    def test_alerts_changed_confirms_fired_alerts(self, get_redis):
+        engine = make_engine((1, 10, 'price_above', 100.0))
+        engine.evaluate(10, {'price_above': 120.0})
+
+        engine.alerts_changed([Alert(id=1, stock_id=10, alert_type='price_above', target_value=100, status='triggered')])
+        engine.restore([1])
+
+        self.assertEqual(engine.evaluate(10, {'price_above': 130.0}), [])
+        get_redis.return_value.pipeline.return_value.execute.assert_called_once()
+
+    @mock.patch('alerts.engine.get_redis')
+    def test_alerts_changed_moves_and_removes_alerts(self, get_redis):
+        engine = make_engine((1, 10, 'price_above', 100.0), (2, 10, 'price_above', 100.0))
+
+        engine.alert_changed(Alert(id=1, stock_id=10, alert_type='price_above', target_value=200, status='active'))
+        engine.alert_changed(Alert(id=2, stock_id=10, alert_type='price_above', target_value=100), deleted=True)
+
+        self.assertEqual(engine.evaluate(10, {'price_above': 150.0}), [])
+        self.assertEqual(engine.evaluate(10, {'price_above': 200.0}), [(1, 200.0)])
+
+
+@mock.patch('alerts.signals.push_alert_status')
+class AlertSignalTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='trader')
+        self.stock = Stock.objects.create(symbol='AAPL', name='Apple')
+
+    def create_alert(self):
+        return Alert.objects.create(user=self.user, stock=self.stock, alert_type='price_above', target_value=100)
+
+    def test_changes_are_published_on_commit(self, push_alert_status):
+        with mock.patch('alerts.signals.get_alert_engine') as get_alert_engine:
+            with self.captureOnCommitCallbacks(execute=True):
+                alert = self.create_alert()
+                get_alert_engine.return_value.alert_changed.assert_not_called()
+
+            get_alert_engine.return_value.alert_changed.assert_called_once()
+            with self.captureOnCommitCallbacks(execute=True):
+                alert_id = alert.id
+                alert.delete()
+
+        published, kwargs = get_alert_engine.return_value.alert_changed.call_args
+        self.assertEqual(published[0].id, alert_id)
+        self.assertTrue(kwargs['deleted'])
+
+    def test_rolled_back_changes_are_not_published(self, push_alert_status):
+        with mock.patch('alerts.signals.get_alert_engine') as get_alert_engine:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                try:
+                    with transaction.atomic():
+                        self.create_alert()
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+
+        self.assertEqual(callbacks, [])
+        get_alert_engine.return_value.alert_changed.assert_not_called()
+
+    @mock.patch('alerts.engine.get_redis', side_effect=ConnectionError('redis is down'))
+    def test_redis_errors_do_not_fail_the_save(self, get_redis, push_alert_status):
+        with self.captureOnCommitCallbacks(execute=True):
+            alert = self.create_alert()
+
+        self.assertTrue(Alert.objects.filter(id=alert.id).exists())
+        push_alert_status.assert_called_once()
@@ -0,0 +1,89 @@
+import logging
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .engine import get_alert_engine, tick_values
+from .models import Alert, AlertHistory
+from .push import push_alert_triggered
+from .tasks import send_alert_notifications
+
+logger = logging.getLogger(__name__)
+
+
+def check_alerts(ticks):
+    """Trigger every active alert crossed by ``[(stock_id, price_data, volume_signal), ...]``"""
+    engine = get_alert_engine()
+    fired = []
+    for stock_id, price_data, volume_signal in ticks:
+        fired.extend(engine.evaluate(stock_id, tick_values(price_data, volume_signal)))
+    if fired:
+        try:
+            history, skipped = trigger_alerts(fired)
+        except Exception:
+            # Still active in the database; keep evaluating them
+            engine.restore([alert_id for alert_id, value in fired])
+            raise
+        # Locked by another worker, or no longer active; the next tick (or
+        # sync) settles which
+        engine.restore(skipped)
+    return fired
+
+
+def trigger_alerts(fired):
+    """Trigger ``[(alert_id, value), ...]`` in bulk and queue their notifications.
+
+    Alerts that are no longer active (or are locked by another worker right
+    now) are skipped. A whole batch costs one locking select, one bulk
+    update and one history insert. Returns the new history rows and the
+    ids of the skipped alerts.
+    """
+    if not fired:
+        return [], []
+    values = dict(fired)
+    now = timezone.now()
+
+    with transaction.atomic():
+        alerts = list(
+            Alert.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(id__in=values, status='active')
+            .select_related('stock')
+        )
+        if not alerts:
+            return [], list(values)
+        for alert in alerts:
+            if values[alert.id] is not None:
+                alert.current_value = round(values[alert.id], 2)
+            alert.status = 'triggered'
+            alert.triggered_at = now
+        Alert.objects.bulk_update(alerts, ['current_value', 'status', 'triggered_at'])
+
+        history = AlertHistory.objects.bulk_create([
+            AlertHistory(alert=alert, triggered_value=alert.current_value or alert.target_value)
+            for alert in alerts
+        ])
+        # bulk_update skips the Alert signals, so sync the engines here
+        transaction.on_commit(lambda: record_triggered(alerts))
+        transaction.on_commit(lambda: push_alert_triggered(history))
+        transaction.on_commit(lambda: queue_notifications([entry.id for entry in history]))
+
+    logger.info(f"Triggered {len(alerts)} alerts")
+    triggered = {alert.id for alert in alerts}
+    return history, [alert_id for alert_id in values if alert_id not in triggered]
+
+
+def record_triggered(alerts):
+    """Drop triggered alerts from the engines"""
+    try:
+        get_alert_engine().alerts_changed(alerts)
+    except Exception as e:
+        logger.error(f"Error recording {len(alerts)} triggered alerts: {str(e)}")
+
+
+def queue_notifications(history_ids):
+    """Queue notification tasks for triggered alerts, ALERT_NOTIFICATION_BATCH_SIZE at a time"""
+    size = max(1, settings.ALERT_NOTIFICATION_BATCH_SIZE)
+    for start in range(0, len(history_ids), size):
+        try:
+            send_alert_notifications.delay(history_ids[start:start + size])
+        except Exception as e:
+            logger.error(f"Error queueing notifications for {len(history_ids[start:start + size])} alerts: {str(e)}")
@@ -3,8 +3,8 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
 from .models import Alert, AlertHistory
+from .triggers import trigger_alerts
 from .serializers import AlertSerializer, AlertListSerializer, AlertHistorySerializer
 
 
@@ -13,7 +13,7 @@ class AlertViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Alert.objects.filter(user=self.request.user)
+        return Alert.objects.filter(user=self.request.user).select_related('stock__latest_quote')
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -29,17 +29,11 @@ class AlertViewSet(viewsets.ModelViewSet):
         alert = self.get_object()
         if alert.status != 'active':
             return Response({'error': 'Alert is not active'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        alert.status = 'triggered'
-        alert.triggered_at = timezone.now()
-        alert.save()
-        
-        # Create history record
-        AlertHistory.objects.create(
-            alert=alert,
-            triggered_value=alert.current_value or alert.target_value
-        )
-        
+
+        history, skipped = trigger_alerts([(alert.id, None)])
+        if skipped:
+            return Response({'error': 'Alert is not active'}, status=status.HTTP_400_BAD_REQUEST)
+
         return Response({'message': 'Alert triggered'}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['post'])
@@ -5,3 +5,5 @@ class StocksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'stocks'
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,78 @@
+import json
+import redis
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels_redis.pubsub import RedisPubSubChannelLayer
+from channels_redis.utils import _consistent_hash, decode_hosts
+from django.conf import settings
+
+channel_layer = get_channel_layer()
+
+_publishers = None
+
+
+def _redis_for(host):
+    host = dict(host)
+    address = host.pop('address', None)
+    if address:
+        return redis.Redis.from_url(address, **host)
+    return redis.Redis(**host)
+
+
+def _get_publishers():
+    """Sync Redis clients for the pub/sub layer's shards; empty for other layers"""
+    global _publishers
+    if _publishers is None:
+        if isinstance(channel_layer, RedisPubSubChannelLayer):
+            hosts = settings.CHANNEL_LAYERS['default'].get('CONFIG', {}).get('hosts')
+            _publishers = [_redis_for(host) for host in decode_hosts(hosts)]
+        else:
+            _publishers = []
+    return _publishers
+
+
+def frame(message_type, data):
+    """Build a channel layer message whose websocket frame is already encoded.
+
+    Consumers forward ``text`` as is, so a broadcast is serialized once per
+    tick rather than once per connection. ``data`` is kept for consumers
+    that need to inspect the update.
+    """
+    return {
+        'type': message_type,
+        'data': data,
+        'text': json.dumps({'type': message_type, 'data': data}),
+    }
+
+
+async def _group_send_all(messages):
+    for group, message in messages:
+        await channel_layer.group_send(group, message)
+
+
+def group_send_many(messages):
+    """Send ``[(group, message), ...]`` to channel groups from synchronous code.
+
+    With ``RedisPubSubChannelLayer`` a group message is a single PUBLISH that
+    every ASGI process subscribed to the group fans out to its own sockets,
+    so Redis work per message is O(processes) rather than O(connections).
+    Here those PUBLISHes are written with plain Redis clients, pipelined per
+    shard, which avoids spinning up an event loop and a layer connection
+    per call from Celery workers. Other layers go through ``group_send``.
+    """
+    publishers = _get_publishers()
+    if not publishers:
+        async_to_sync(_group_send_all)(messages)
+        return
+
+    prefix = settings.CHANNEL_LAYERS['default'].get('CONFIG', {}).get('prefix', 'asgi')
+    pipes = {}
+    for group, message in messages:
+        # Same topic naming and sharding as RedisPubSubLoopLayer.group_send
+        topic = f'{prefix}__group__{group}'
+        shard = _consistent_hash(topic, len(publishers))
+        if shard not in pipes:
+            pipes[shard] = publishers[shard].pipeline(transaction=False)
+        pipes[shard].publish(topic, channel_layer.serialize(message))
+    for pipe in pipes.values():
+        pipe.execute()
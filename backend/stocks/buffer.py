@@ -0,0 +1,228 @@
+import atexit
+import csv
+import io
+import threading
+import time
+import logging
+from django.conf import settings
+from django.db import (
+    DataError, IntegrityError, InterfaceError, OperationalError, close_old_connections, connection, transaction
+)
+from django.utils import timezone
+from .models import StockPrice, LatestQuote
+from .providers import PRICE_FIELDS
+from .rollups import update_bars, upsert
+
+logger = logging.getLogger(__name__)
+
+COPY_COLUMNS = ['stock_id', *PRICE_FIELDS, 'timestamp']
+LATEST_FIELDS = ['price', 'volume', 'change', 'change_percent']
+
+
+class TickBuffer:
+    """Collects StockPrice rows and writes them in bulk.
+
+    A flush happens when ``max_size`` rows are waiting or the oldest row is
+    ``max_age`` seconds old, whichever comes first. Rows are timestamped when
+    they are added, so buffering does not shift tick times. Broadcasting is
+    not buffered; callers send websocket updates as soon as a tick arrives.
+    Each flush also folds its rows into the OHLCV bars (``stocks.rollups``)
+    and moves each stock's LatestQuote to its newest tick.
+
+    When the database is unreachable the rows are put back and retried on
+    the next flush; at most ``max_pending`` rows are held, the oldest being
+    dropped first. When it rejects the batch (e.g. a tick for a deleted
+    stock) the batch is split in halves until the rejected rows are found,
+    and those are dropped.
+    """
+
+    def __init__(self, max_size, max_age, use_copy=True, max_pending=50000):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.use_copy = use_copy
+        self.max_pending = max_pending
+        self._rows = []
+        self._first_added = None
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._stopped = threading.Event()
+
+    def add(self, stock_id, price_data, timestamp=None):
+        row = (stock_id, price_data, timestamp or timezone.now())
+        with self._lock:
+            if not self._rows:
+                self._first_added = time.monotonic()
+            self._rows.append(row)
+            full = len(self._rows) >= self.max_size
+        self._ensure_flusher()
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered row; returns the number of rows written"""
+        with self._lock:
+            rows, self._rows = self._rows, []
+            self._first_added = None
+        if not rows:
+            return 0
+        if not connection.in_atomic_block:
+            # The flusher thread holds its connection for the life of the
+            # process; replace it if the database dropped it
+            close_old_connections()
+        try:
+            self._insert(rows)
+        except (IntegrityError, DataError) as e:
+            logger.warning(f"Database rejected {len(rows)} buffered ticks, retrying in parts: {str(e)}")
+            rows = self._insert_parts(rows)
+        except (OperationalError, InterfaceError) as e:
+            logger.error(f"Error flushing {len(rows)} buffered ticks, will retry: {str(e)}")
+            self._requeue(rows)
+            return 0
+        except Exception as e:
+            logger.error(f"Error flushing {len(rows)} buffered ticks, dropping them: {str(e)}")
+            return 0
+        if rows:
+            self._roll_up(rows)
+        return len(rows)
+
+    def _insert_parts(self, rows):
+        """Insert ``rows`` by halves, dropping single rows the database rejects; returns the rows written"""
+        middle = len(rows) // 2
+        written = []
+        for part in (rows[:middle], rows[middle:]):
+            if not part:
+                continue
+            try:
+                self._insert(part)
+            except (IntegrityError, DataError) as e:
+                if len(part) == 1:
+                    logger.error(f"Dropping tick for stock {part[0][0]} at {part[0][2]}: {str(e)}")
+                else:
+                    written.extend(self._insert_parts(part))
+            except (OperationalError, InterfaceError) as e:
+                logger.error(f"Error flushing {len(part)} buffered ticks, will retry: {str(e)}")
+                self._requeue(part)
+            except Exception as e:
+                logger.error(f"Error flushing {len(part)} buffered ticks, dropping them: {str(e)}")
+            else:
+                written.extend(part)
+        return written
+
+    def _requeue(self, rows):
+        with self._lock:
+            rows = rows + self._rows
+            dropped = len(rows) - self.max_pending
+            if dropped > 0:
+                rows = rows[dropped:]
+                logger.error(f"Tick buffer full, dropped {dropped} oldest ticks")
+            self._rows = rows
+            # Retry once max_age has passed again rather than immediately
+            self._first_added = time.monotonic()
+
+    def stop(self):
+        self._stopped.set()
+        self.flush()
+
+    def _ensure_flusher(self):
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._run, name='tick-buffer-flush', daemon=True)
+            self._flusher.start()
+
+    def _run(self):
+        try:
+            while not self._stopped.wait(self.max_age / 2):
+                first_added = self._first_added
+                if first_added is not None and time.monotonic() - first_added >= self.max_age:
+                    self.flush()
+        finally:
+            connection.close()
+
+    def _insert(self, rows):
+        with transaction.atomic():
+            if self.use_copy and connection.vendor == 'postgresql':
+                self._copy(rows)
+            else:
+                StockPrice.objects.bulk_create([
+                    StockPrice(stock_id=stock_id, timestamp=timestamp, **price_data)
+                    for stock_id, price_data, timestamp in rows
+                ])
+
+    def _roll_up(self, rows):
+        """Update bars and latest quotes; the ticks are already committed either way"""
+        try:
+            with transaction.atomic():
+                update_bars(rows)
+        except Exception as e:
+            logger.error(f"Error rolling up {len(rows)} ticks into bars: {str(e)}")
+        try:
+            self._update_latest(rows)
+        except Exception as e:
+            logger.error(f"Error updating latest quotes for {len(rows)} ticks: {str(e)}")
+
+    def _update_latest(self, rows):
+        latest = {}
+        for stock_id, price_data, timestamp in rows:
+            if stock_id not in latest or timestamp >= latest[stock_id][1]:
+                latest[stock_id] = (price_data, timestamp)
+        quote = connection.ops.quote_name
+        table = quote(LatestQuote._meta.db_table)
+        columns = [*LATEST_FIELDS, 'timestamp']
+        values = [
+            (
+                stock_id,
+                *(price_data.get(field) for field in LATEST_FIELDS),
+                connection.ops.adapt_datetimefield_value(timestamp),
+            )
+            for stock_id, (price_data, timestamp) in latest.items()
+        ]
+        with connection.cursor() as cursor:
+            # A late flush or requeued rows must not move a quote back in time
+            upsert(
+                cursor,
+                f"INSERT INTO {table} (stock_id, {', '.join(quote(column) for column in columns)})",
+                f"""ON CONFLICT (stock_id) DO UPDATE SET
+                    {', '.join(f'{quote(column)} = EXCLUDED.{quote(column)}' for column in columns)}
+                    WHERE EXCLUDED.{quote('timestamp')} >= {table}.{quote('timestamp')}""",
+                values,
+            )
+
+    def _copy(self, rows):
+        data = io.StringIO()
+        writer = csv.writer(data)
+        for stock_id, price_data, timestamp in rows:
+            writer.writerow([
+                stock_id,
+                *('' if price_data.get(field) is None else price_data[field] for field in PRICE_FIELDS),
+                timestamp.isoformat(),
+            ])
+        data.seek(0)
+
+        table = connection.ops.quote_name(StockPrice._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(column) for column in COPY_COLUMNS)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", data)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_tick_buffer():
+    """Return this process' tick buffer, creating it on first use"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = TickBuffer(
+                    max_size=settings.TICK_BUFFER_SIZE,
+                    max_age=settings.TICK_BUFFER_MAX_AGE,
+                    use_copy=settings.TICK_BUFFER_USE_COPY,
+                    max_pending=settings.TICK_BUFFER_MAX_PENDING,
+                )
+                atexit.register(_buffer.stop)
+    return _buffer
+
+
+def flush_tick_buffer():
+    if _buffer is not None:
+        _buffer.flush()
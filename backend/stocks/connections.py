@@ -0,0 +1,113 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from collections import Counter
+from django.conf import settings
+from .redis_client import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+PROCESSES_KEY = 'stocks:ws:processes'
+PROCESS_ID = f'{socket.gethostname()}:{os.getpid()}'
+
+
+class ConnectionRegistry:
+    """Websocket connections open in this process.
+
+    A single task per process pings every connection each heartbeat
+    interval, reaps connections that have not sent anything (a pong or any
+    other message) within the idle timeout, and publishes this process'
+    counts to Redis for ``get_connection_stats``.
+    """
+
+    def __init__(self, heartbeat_interval, idle_timeout):
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self._consumers = set()
+        self._task = None
+
+    def __len__(self):
+        return len(self._consumers)
+
+    def add(self, consumer):
+        self._consumers.add(consumer)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def discard(self, consumer):
+        self._consumers.discard(consumer)
+
+    def stats(self):
+        symbols = Counter()
+        for consumer in self._consumers:
+            symbols.update(consumer.followed_symbols())
+        return {
+            'process': PROCESS_ID,
+            'connections': len(self._consumers),
+            'subscribed_all': sum(1 for consumer in self._consumers if consumer.subscribed_all),
+            'symbols': dict(symbols),
+            'dropped': sum(consumer.outbox.dropped for consumer in self._consumers),
+            'updated_at': time.time(),
+        }
+
+    async def heartbeat(self):
+        now = time.monotonic()
+        for consumer in list(self._consumers):
+            if self.idle_timeout and now - consumer.last_seen > self.idle_timeout:
+                await consumer.reap()
+            else:
+                await consumer.ping()
+
+    async def publish(self):
+        await get_async_redis().hset(PROCESSES_KEY, PROCESS_ID, json.dumps(self.stats()))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.heartbeat()
+                await self.publish()
+            except Exception as e:
+                logger.error(f"Error in websocket heartbeat: {str(e)}")
+
+
+_registry = ConnectionRegistry(
+    heartbeat_interval=settings.WEBSOCKET_HEARTBEAT_INTERVAL,
+    idle_timeout=settings.WEBSOCKET_IDLE_TIMEOUT,
+)
+
+
+def get_connection_registry():
+    return _registry
+
+
+def get_connection_stats():
+    """Add up the counts every live ASGI process last published.
+
+    Processes that missed three heartbeats are treated as gone and removed.
+    """
+    redis = get_redis()
+    cutoff = time.time() - settings.WEBSOCKET_HEARTBEAT_INTERVAL * 3
+    processes = []
+    stale = []
+    for process, entry in redis.hgetall(PROCESSES_KEY).items():
+        entry = json.loads(entry)
+        if entry['updated_at'] < cutoff:
+            stale.append(process)
+        else:
+            processes.append(entry)
+    if stale:
+        redis.hdel(PROCESSES_KEY, *stale)
+
+    symbols = Counter()
+    for entry in processes:
+        symbols.update(entry['symbols'])
+    return {
+        'connections': sum(entry['connections'] for entry in processes),
+        'subscribed_all': sum(entry['subscribed_all'] for entry in processes),
+        'symbols': dict(symbols.most_common()),
+        'processes': sorted(processes, key=lambda entry: entry['process']),
+    }
@@ -1,36 +1,210 @@
+import asyncio
 import json
+import logging
+import time
+from functools import partial
+from urllib.parse import parse_qs
+import msgpack
+from django.conf import settings
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
-from .models import Stock, StockPrice
-from .serializers import StockListSerializer
+from watchlists.subscriptions import watchlist_symbols
+from .connections import get_connection_registry
+from .groups import (
+    MARKET_GROUP, STOCK_UPDATES_GROUP, clean_symbols, symbol_group, user_group, watchlist_group
+)
+from .outbox import Outbox
+from .protocol import MSGPACK_SUBPROTOCOL, DeltaEncoder
+from .replay import updates_since
+from .snapshot import get_snapshot_cache
+
+logger = logging.getLogger(__name__)
+
+# Symbols a single connection may follow individually; beyond that use 'all'
+MAX_SUBSCRIPTIONS = 200
+
+# Close code for clients that fell too far behind the update stream
+SLOW_CONSUMER_CLOSE_CODE = 4008
+# Close code for clients that stopped answering heartbeats
+IDLE_CLOSE_CODE = 4009
+# Close code when this process already holds WEBSOCKET_MAX_CONNECTIONS
+TRY_AGAIN_LATER_CLOSE_CODE = 1013
+
+# Accepted range for ?batch_ms=, the window over which ticks are batched
+MIN_BATCH_MS = 20
+MAX_BATCH_MS = 1000
 
 
 class StockConsumer(AsyncWebsocketConsumer):
+    """Streams stock ticks to a client.
+
+    A connection only receives ticks for what it subscribes to: individual
+    symbols (one channel group each) or ``'all'`` (the ``stock_updates``
+    group). Market-wide messages such as leaderboard changes go to everyone.
+
+    Frames go out through an ``Outbox``. By default a slow client only gets
+    the latest tick per symbol; ``?conflate=0`` asks for every tick instead.
+    Either way a client that falls too far behind is closed with code 4008.
+    This needs a server whose send waits for the socket, which is why the
+    app runs under uvicorn with ``--ws websockets`` (see ``Outbox``).
+
+    With ``?batch_ms=N`` ticks are collected for N milliseconds and sent as
+    one ``stock_updates_batch`` frame keyed by symbol, holding each symbol's
+    latest tick in the window.
+
+    Clients that offer the ``stocks.msgpack.v1`` subprotocol get binary
+    MessagePack frames with numeric ids and changed fields only
+    (see ``stocks.protocol``).
+
+    Every update carries a global ``seq``. A client reconnecting with
+    ``?last_seq=N`` gets a ``replay`` of the latest update per stock since
+    N instead of ``initial_data``, unless N has left the replay buffer.
+    Passing ``?symbols=AAPL,MSFT`` (or ``all``) subscribes before that
+    read, so no tick falls between the replay and the live stream.
+
+    The server sends ``ping`` every WEBSOCKET_HEARTBEAT_INTERVAL seconds;
+    clients that send nothing back for WEBSOCKET_IDLE_TIMEOUT seconds are
+    closed with code 4009.
+
+    Authenticated connections also join ``user_<id>`` and receive
+    ``alert_triggered`` and ``alert_status`` events for their own alerts.
+
+    ``{"type": "subscribe_watchlist", "watchlist_id": N}`` streams the
+    symbols on one of the user's (or a public) watchlists and keeps the
+    subscription in step as stocks are added to or removed from it.
+    """
+
     async def connect(self):
-        self.room_group_name = 'stock_updates'
-        
-        # Join room group
+        # Symbols subscribed to explicitly; those streamed for a watchlist
+        # are kept per watchlist in self.watchlists
+        self.subscribed_symbols = set()
+        # Symbol groups actually joined; none while subscribed to 'all',
+        # which already carries every tick
+        self.joined_symbols = set()
+        self.subscribed_all = False
+        self.closing = False
+        self.batch_task = None
+        self.user_group = None
+        self.watchlists = {}
+        self.last_seen = time.monotonic()
+
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        conflate = query.get('conflate', [None])[0]
+        self.outbox = Outbox(
+            self.send_payload,
+            conflate=settings.WEBSOCKET_CONFLATE if conflate is None else conflate not in ('0', 'false'),
+            max_pending=settings.WEBSOCKET_MAX_PENDING,
+            max_lag=settings.WEBSOCKET_MAX_LAG,
+        )
+        self.outbox.start()
+
+        registry = get_connection_registry()
+        if settings.WEBSOCKET_MAX_CONNECTIONS and len(registry) >= settings.WEBSOCKET_MAX_CONNECTIONS:
+            self.closing = True
+            await self.accept()
+            await self.close(code=TRY_AGAIN_LATER_CLOSE_CODE)
+            return
+        registry.add(self)
+
+        self.batch = {}
+        batch_ms = query.get('batch_ms', [None])[0]
+        if batch_ms:
+            try:
+                batch_ms = min(max(int(batch_ms), MIN_BATCH_MS), MAX_BATCH_MS)
+            except ValueError:
+                batch_ms = None
+        if batch_ms:
+            self.batch_task = asyncio.ensure_future(self.send_batches(batch_ms / 1000))
+
+        # Join market-wide group
         await self.channel_layer.group_add(
-            self.room_group_name,
+            MARKET_GROUP,
             self.channel_name
         )
-        
-        await self.accept()
-        
-        # Send initial data
-        await self.send_initial_data()
+
+        # Signed-in users also get their own alert events
+        user = self.scope.get('user')
+        if user is not None and user.is_authenticated:
+            self.user_group = user_group(user.id)
+            await self.channel_layer.group_add(self.user_group, self.channel_name)
+
+        self.encoder = None
+        if MSGPACK_SUBPROTOCOL in self.scope.get('subprotocols', []):
+            self.encoder = DeltaEncoder()
+            await self.accept(subprotocol=MSGPACK_SUBPROTOCOL)
+        else:
+            await self.accept()
+
+        # Join the tick groups given as ?symbols=AAPL,MSFT (or all) before
+        # reading the replay ring or snapshot, so nothing published in
+        # between is lost
+        symbols = query.get('symbols', [None])[0]
+        if symbols:
+            await self.subscribe_to_stocks(symbols.split(','))
+
+        # Send what was missed since last_seq, or initial data
+        last_seq = query.get('last_seq', [None])[0]
+        if last_seq is not None and last_seq.isdigit() and await self.send_replay(int(last_seq)):
+            return
+        snapshot = await self.send_initial_data()
+        if symbols:
+            # The snapshot may be cached; catch up on what came after it
+            updates, seq = await updates_since(snapshot.seq)
+            if updates:
+                await self.send_updates(updates, seq)
 
     async def disconnect(self, close_code):
-        # Leave room group
-        await self.channel_layer.group_discard(
-            self.room_group_name,
-            self.channel_name
-        )
+        get_connection_registry().discard(self)
+        if self.batch_task is not None:
+            self.batch_task.cancel()
+        await self.outbox.stop()
+        await self.leave_groups()
+
+    async def leave_groups(self):
+        """Leave every group this connection joined"""
+        groups = [MARKET_GROUP, *(symbol_group(symbol) for symbol in self.joined_symbols)]
+        if self.subscribed_all:
+            groups.append(STOCK_UPDATES_GROUP)
+        if self.user_group is not None:
+            groups.append(self.user_group)
+        groups.extend(watchlist_group(watchlist_id) for watchlist_id in self.watchlists)
+        self.subscribed_symbols = set()
+        self.joined_symbols = set()
+        self.subscribed_all = False
+        self.user_group = None
+        self.watchlists = {}
+        for group in groups:
+            await self.channel_layer.group_discard(
+                group,
+                self.channel_name
+            )
+
+    async def ping(self):
+        await self.send_json({'type': 'ping'})
+
+    async def reap(self):
+        """Drop a connection that stopped answering; it may be half-open, so leave groups now"""
+        if self.closing:
+            return
+        self.closing = True
+        get_connection_registry().discard(self)
+        await self.leave_groups()
+        await self.close(code=IDLE_CLOSE_CODE)
 
-    async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
+    async def receive(self, text_data=None, bytes_data=None):
+        self.last_seen = time.monotonic()
+        try:
+            if bytes_data is not None:
+                text_data_json = msgpack.unpackb(bytes_data)
+            else:
+                text_data_json = json.loads(text_data)
+        except (ValueError, TypeError, msgpack.UnpackException):
+            await self.send_json({'type': 'error', 'message': 'Messages must be JSON or MessagePack'})
+            return
+        if not isinstance(text_data_json, dict):
+            await self.send_json({'type': 'error', 'message': 'Messages must be objects'})
+            return
         message_type = text_data_json.get('type')
-        
+
         if message_type == 'subscribe':
             # Handle subscription to specific stocks
             symbols = text_data_json.get('symbols', [])
@@ -39,42 +213,271 @@ class StockConsumer(AsyncWebsocketConsumer):
             # Handle unsubscription
             symbols = text_data_json.get('symbols', [])
             await self.unsubscribe_from_stocks(symbols)
+        elif message_type == 'subscribe_watchlist':
+            await self.subscribe_to_watchlist(text_data_json.get('watchlist_id'))
+        elif message_type == 'unsubscribe_watchlist':
+            await self.unsubscribe_from_watchlist(text_data_json.get('watchlist_id'))
+        elif message_type == 'stats':
+            await self.connection_stats()
+        elif message_type == 'ping':
+            await self.send_json({'type': 'pong'})
+
+    async def send_payload(self, payload):
+        if isinstance(payload, bytes):
+            await self.send(bytes_data=payload)
+        else:
+            await self.send(text_data=payload)
+
+    async def push(self, payload, key=None):
+        """Queue a frame for the client, closing the connection if it is too far behind"""
+        if self.closing:
+            return
+        if not self.outbox.put(payload, key):
+            self.closing = True
+            logger.warning(f"Closing slow websocket client {self.channel_name}: {self.outbox.stats()}")
+            await self.close(code=SLOW_CONSUMER_CLOSE_CODE)
+            await self.outbox.stop()
+
+    async def send_json(self, content, key=None):
+        if self.encoder is not None:
+            await self.push(self.encoder.message(content), key)
+        else:
+            await self.push(json.dumps(content), key)
 
     async def send_initial_data(self):
         """Send initial stock data when client connects"""
-        stocks = await self.get_all_stocks()
-        await self.send(text_data=json.dumps({
-            'type': 'initial_data',
-            'data': stocks
-        }))
+        snapshot = await get_snapshot_cache().get()
+        if self.encoder is not None:
+            await self.push(partial(self.encoder.snapshot, snapshot.stocks, snapshot.seq))
+        else:
+            await self.push(snapshot.text)
+        return snapshot
+
+    async def send_replay(self, last_seq):
+        """Send the updates since ``last_seq``; returns False if a snapshot is needed instead"""
+        updates, seq = await updates_since(last_seq)
+        if updates is None:
+            return False
+        await self.send_updates(updates, seq)
+        return True
+
+    async def send_updates(self, updates, seq):
+        if self.encoder is not None:
+            await self.push(partial(self.encoder.batch, updates))
+        else:
+            await self.send_json({
+                'type': 'replay',
+                'data': updates,
+                'seq': seq
+            })
+
+    async def send_frame(self, event, key=None):
+        """Forward a broadcast, using the frame encoded by the sender when there is one"""
+        text = event.get('text')
+        if text is None:
+            text = json.dumps({
+                'type': event['type'],
+                'data': event['data']
+            })
+        await self.push(text, key)
 
     async def stock_update(self, event):
         """Send stock update to WebSocket"""
-        await self.send(text_data=json.dumps({
-            'type': 'stock_update',
-            'data': event['data']
-        }))
+        if self.batch_task is not None:
+            self.batch[event['data']['symbol']] = event['data']
+            return
+        key = ('stock_update', event['data']['symbol'])
+        if self.encoder is not None:
+            # Deltas depend on what was last sent, so encode when sending
+            await self.push(partial(self.encoder.update, event['data']), key)
+            return
+        await self.send_frame(event, key=key)
+
+    async def send_batches(self, window):
+        """Send the ticks collected in each window as one frame"""
+        while True:
+            await asyncio.sleep(window)
+            # While a conflating client is still busy, keep merging into the next batch
+            if not self.batch or (self.outbox.conflate and self.outbox.depth):
+                continue
+            batch, self.batch = self.batch, {}
+            if self.encoder is not None:
+                await self.push(partial(self.encoder.batch, list(batch.values())))
+                continue
+            await self.send_json({
+                'type': 'stock_updates_batch',
+                'data': batch
+            })
+
+    async def leaderboard_update(self, event):
+        """Send new top gainers/losers to WebSocket"""
+        if self.encoder is not None:
+            await self.push(partial(self.encoder.leaderboard, event['data']), key='leaderboard_update')
+            return
+        await self.send_frame(event, key='leaderboard_update')
+
+    async def alert_triggered(self, event):
+        """Send one of this user's alerts that just fired"""
+        await self.send_alert_event(event)
+
+    async def alert_status(self, event):
+        """Send a status change (created, cancelled, deleted...) of one of this user's alerts"""
+        await self.send_alert_event(event)
+
+    async def send_alert_event(self, event):
+        # Never conflated: every alert event reaches the client
+        if self.encoder is not None:
+            await self.send_json({'type': event['type'], 'data': event['data']})
+            return
+        await self.send_frame(event)
+
+    async def connection_stats(self):
+        """Send this connection's queue statistics"""
+        await self.send_json({
+            'type': 'connection_stats',
+            'data': self.outbox.stats()
+        })
 
     async def subscribe_to_stocks(self, symbols):
-        """Subscribe to updates for specific stocks"""
-        # In a more complex implementation, you might want to track
-        # which stocks each client is subscribed to
-        await self.send(text_data=json.dumps({
+        """Join the groups for ``symbols``, or the all-ticks group for ``'all'``"""
+        if not isinstance(symbols, list):
+            await self.send_json({'type': 'error', 'message': 'symbols must be a list'})
+            return
+        if any(isinstance(symbol, str) and symbol.lower() == 'all' for symbol in symbols):
+            if not self.subscribed_all:
+                await self.channel_layer.group_add(STOCK_UPDATES_GROUP, self.channel_name)
+                self.subscribed_all = True
+                await self.sync_symbol_groups()
+            await self.send_json({
+                'type': 'subscription_confirmed',
+                'symbols': ['all']
+            })
+            return
+
+        await self.send_json({
             'type': 'subscription_confirmed',
-            'symbols': symbols
-        }))
+            'symbols': await self.join_symbols(clean_symbols(symbols))
+        })
 
-    async def unsubscribe_from_stocks(self, symbols):
-        """Unsubscribe from updates for specific stocks"""
-        await self.send(text_data=json.dumps({
+    async def join_symbols(self, symbols):
+        """Subscribe to ``symbols`` up to MAX_SUBSCRIPTIONS; returns the newly added ones"""
+        followed = self.followed_symbols()
+        added = []
+        for symbol in symbols:
+            if symbol in self.subscribed_symbols:
+                continue
+            if symbol not in followed and len(followed) >= MAX_SUBSCRIPTIONS:
+                await self.send_subscription_limit()
+                break
+            self.subscribed_symbols.add(symbol)
+            followed.add(symbol)
+            added.append(symbol)
+        await self.sync_symbol_groups()
+        return added
+
+    async def leave_symbol(self, symbol):
+        """Drop an explicit subscription; watchlists streaming the symbol keep it joined"""
+        if symbol in self.subscribed_symbols:
+            self.subscribed_symbols.discard(symbol)
+            await self.sync_symbol_groups()
+            return True
+        return False
+
+    async def send_subscription_limit(self):
+        await self.send_json({
+            'type': 'error',
+            'message': f'Subscription limit of {MAX_SUBSCRIPTIONS} symbols reached'
+        })
+
+    def followed_symbols(self):
+        """Symbols subscribed to explicitly or through a watchlist"""
+        return self.subscribed_symbols.union(*self.watchlists.values())
+
+    async def sync_symbol_groups(self):
+        """Join or leave symbol groups so each tick arrives exactly once"""
+        wanted = set() if self.subscribed_all else self.followed_symbols()
+        for symbol in wanted - self.joined_symbols:
+            await self.channel_layer.group_add(symbol_group(symbol), self.channel_name)
+            self.joined_symbols.add(symbol)
+        for symbol in self.joined_symbols - wanted:
+            await self.channel_layer.group_discard(symbol_group(symbol), self.channel_name)
+            self.joined_symbols.discard(symbol)
+
+    async def subscribe_to_watchlist(self, watchlist_id):
+        """Stream the symbols on a watchlist and follow its edits"""
+        if not isinstance(watchlist_id, int) or isinstance(watchlist_id, bool):
+            await self.send_json({'type': 'error', 'message': 'watchlist_id must be an integer'})
+            return
+        symbols = await watchlist_symbols(watchlist_id, self.scope.get('user'))
+        if symbols is None:
+            await self.send_json({'type': 'error', 'message': f'Watchlist {watchlist_id} not found'})
+            return
+        others = self.subscribed_symbols.union(
+            *(followed for other_id, followed in self.watchlists.items() if other_id != watchlist_id)
+        )
+        if len(others.union(symbols)) > MAX_SUBSCRIPTIONS:
+            await self.send_subscription_limit()
+            return
+
+        if watchlist_id not in self.watchlists:
+            await self.channel_layer.group_add(watchlist_group(watchlist_id), self.channel_name)
+        self.watchlists[watchlist_id] = set(symbols)
+        await self.sync_symbol_groups()
+        await self.send_json({
+            'type': 'watchlist_subscribed',
+            'watchlist_id': watchlist_id,
+            'symbols': sorted(symbols)
+        })
+
+    async def unsubscribe_from_watchlist(self, watchlist_id):
+        """Stop following a watchlist and drop the symbols only it was streaming"""
+        symbols = self.watchlists.pop(watchlist_id, None)
+        if symbols is None:
+            return
+        await self.channel_layer.group_discard(watchlist_group(watchlist_id), self.channel_name)
+        await self.sync_symbol_groups()
+        await self.send_json({
             'type': 'unsubscription_confirmed',
-            'symbols': symbols
-        }))
+            'symbols': sorted(symbols - self.followed_symbols())
+        })
+
+    async def watchlist_changed(self, event):
+        """Follow a symbol being added to or removed from a streamed watchlist"""
+        data = event['data']
+        symbols = self.watchlists.get(data['watchlist_id'])
+        if symbols is None:
+            return
+        # Edits made by the watchlist's owner are followed even past
+        # MAX_SUBSCRIPTIONS; the limit applies when subscribing
+        if data['action'] == 'added':
+            symbols.add(data['symbol'])
+        else:
+            symbols.discard(data['symbol'])
+        await self.sync_symbol_groups()
+        if self.encoder is not None:
+            await self.send_json({'type': event['type'], 'data': data})
+            return
+        await self.send_frame(event)
 
-    @database_sync_to_async
-    def get_all_stocks(self):
-        """Get all active stocks with latest prices"""
-        stocks = Stock.objects.filter(is_active=True)[:50]  # Limit for performance
-        serializer = StockListSerializer(stocks, many=True)
-        return serializer.data
+    async def unsubscribe_from_stocks(self, symbols):
+        """Leave the groups for ``symbols``, or the all-ticks group for ``'all'``"""
+        if not isinstance(symbols, list):
+            await self.send_json({'type': 'error', 'message': 'symbols must be a list'})
+            return
+        removed = []
+        if any(isinstance(symbol, str) and symbol.lower() == 'all' for symbol in symbols):
+            if self.subscribed_all:
+                # Rejoin the individual symbols before leaving 'all' so no tick is missed
+                self.subscribed_all = False
+                await self.sync_symbol_groups()
+                await self.channel_layer.group_discard(STOCK_UPDATES_GROUP, self.channel_name)
+            removed.append('all')
+
+        for symbol in clean_symbols(symbols):
+            if await self.leave_symbol(symbol):
+                removed.append(symbol)
 
+        await self.send_json({
+            'type': 'unsubscription_confirmed',
+            'symbols': removed
+        })
@@ -0,0 +1,47 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from .providers import PRICE_FIELDS
+
+KEY_PREFIX = 'stocks:last_quote:'
+
+
+def _fingerprint(price_data):
+    return [price_data.get(field) for field in PRICE_FIELDS]
+
+
+def filter_changed(quotes):
+    """Drop quotes that repeat the last one ingested for their symbol.
+
+    The last quote per symbol lives in the shared cache so every worker
+    sees it. An unchanged quote is still let through once every
+    QUOTE_HEARTBEAT_INTERVAL seconds so clients get a periodic confirmation.
+    """
+    if not quotes or not settings.QUOTE_CHANGE_DETECTION:
+        return quotes
+
+    now = time.time()
+    heartbeat = settings.QUOTE_HEARTBEAT_INTERVAL
+    keys = {symbol: KEY_PREFIX + symbol for symbol in quotes}
+    last_seen = cache.get_many(keys.values())
+
+    changed = {}
+    for symbol, price_data in quotes.items():
+        fingerprint = _fingerprint(price_data)
+        last = last_seen.get(keys[symbol])
+        if last is not None:
+            last_fingerprint, emitted_at = last
+            if last_fingerprint == fingerprint and now - emitted_at < heartbeat:
+                continue
+        changed[symbol] = price_data
+
+    if changed:
+        cache.set_many(
+            {keys[symbol]: (_fingerprint(price_data), now) for symbol, price_data in changed.items()},
+            timeout=heartbeat * 2,
+        )
+    return changed
+
+
+def is_changed(symbol, price_data):
+    return bool(filter_changed({symbol: price_data}))
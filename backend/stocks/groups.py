@@ -0,0 +1,35 @@
+import re
+
+# Every tick, for clients that subscribe to 'all'
+STOCK_UPDATES_GROUP = 'stock_updates'
+# Market-wide events such as leaderboard changes; every connection joins it
+MARKET_GROUP = 'market'
+
+SYMBOL_RE = re.compile(r'^[A-Z0-9.\-]{1,20}$')
+
+
+def symbol_group(symbol):
+    """Channel group carrying the ticks for one symbol"""
+    return f'stock_{symbol}'
+
+
+def user_group(user_id):
+    """Channel group carrying one user's alert events to all of their connections"""
+    return f'user_{user_id}'
+
+
+def watchlist_group(watchlist_id):
+    """Channel group carrying edits to one watchlist to the connections streaming it"""
+    return f'watchlist_{watchlist_id}'
+
+
+def clean_symbols(symbols):
+    """Upper-case and de-duplicate ``symbols``, dropping anything that is not a ticker"""
+    cleaned = []
+    for symbol in symbols:
+        if not isinstance(symbol, str):
+            continue
+        symbol = symbol.strip().upper()
+        if SYMBOL_RE.match(symbol) and symbol not in cleaned:
+            cleaned.append(symbol)
+    return cleaned
@@ -0,0 +1,116 @@
+import logging
+from django.utils import timezone
+from alerts.triggers import check_alerts
+from .broadcast import frame, group_send_many
+from .buffer import get_tick_buffer
+from .dedup import filter_changed, is_changed
+from .groups import MARKET_GROUP, STOCK_UPDATES_GROUP, symbol_group
+from .leaderboard import get_leaderboards, update_leaderboard
+from .replay import sequence_updates
+from .symbols import get_symbol_cache
+from .volume import get_volume_baseline
+
+logger = logging.getLogger(__name__)
+
+
+def ingest_quote(symbol, price_data):
+    """Buffer a parsed quote for persistence and broadcast it to websocket clients.
+
+    Returns ``None`` when the quote repeats the last one for the symbol.
+    """
+    if not is_changed(symbol, price_data):
+        return None
+
+    stock = get_symbol_cache().get(symbol)
+    timestamp = timezone.now()
+
+    get_tick_buffer().add(stock.id, price_data, timestamp)
+
+    # Send WebSocket update
+    send_stock_update(stock, price_data, timestamp)
+    evaluate_alerts([(stock.id, price_data)])
+    return stock
+
+
+def ingest_quotes(quotes):
+    """Buffer and broadcast a batch of ``{symbol: price_data}`` as one unit of work"""
+    quotes = filter_changed(quotes)
+    if not quotes:
+        return []
+
+    stocks = get_symbol_cache().get_many(quotes)
+    timestamp = timezone.now()
+
+    buffer = get_tick_buffer()
+    updates = []
+    for symbol, price_data in quotes.items():
+        buffer.add(stocks[symbol].id, price_data, timestamp)
+        updates.append(stock_update_data(stocks[symbol], price_data))
+    publish_stock_updates(updates, timestamp)
+    evaluate_alerts([(stocks[symbol].id, price_data) for symbol, price_data in quotes.items()])
+    return list(stocks.values())
+
+
+def stock_update_data(stock, price_data):
+    return {
+        'id': stock.id,
+        'symbol': stock.symbol,
+        'name': stock.name,
+        'latest_price': price_data['price'],
+        'change_percent': price_data['change_percent']
+    }
+
+
+def send_stock_update(stock, price_data, timestamp=None):
+    """Send stock update via WebSocket; returns the data that was sent"""
+    # Prepare data for WebSocket
+    return publish_stock_updates([stock_update_data(stock, price_data)], timestamp)[0]
+
+
+def publish_stock_updates(updates, timestamp=None):
+    """Sequence, broadcast and rank a batch of stock updates taken at ``timestamp``"""
+    try:
+        sequence_updates(updates)
+    except Exception as e:
+        logger.error(f"Error sequencing {len(updates)} stock updates: {str(e)}")
+
+    broadcast_stock_updates(updates)
+    send_leaderboard_update(updates, timestamp)
+    return updates
+
+
+def broadcast_stock_updates(updates):
+    messages = []
+    for stock_data in updates:
+        message = frame('stock_update', stock_data)
+
+        # Clients subscribed to everything, then clients watching this symbol
+        messages.append((STOCK_UPDATES_GROUP, message))
+        messages.append((symbol_group(stock_data['symbol']), message))
+    try:
+        group_send_many(messages)
+    except Exception as e:
+        logger.error(f"Error sending WebSocket updates for {len(updates)} stocks: {str(e)}")
+
+
+def evaluate_alerts(ticks):
+    """Update volume baselines and fire any alerts the ingested ticks crossed"""
+    try:
+        baseline = get_volume_baseline()
+        check_alerts([
+            (stock_id, price_data, baseline.update(stock_id, price_data.get('volume')))
+            for stock_id, price_data in ticks
+        ])
+    except Exception as e:
+        logger.error(f"Error evaluating alerts for {len(ticks)} ticks: {str(e)}")
+
+
+def send_leaderboard_update(updates, timestamp=None):
+    """Re-rank the updated stocks and push the leaderboards if their top changed"""
+    try:
+        if update_leaderboard(updates, timestamp) is None:
+            return
+
+        group_send_many([(MARKET_GROUP, frame('leaderboard_update', get_leaderboards()))])
+    except Exception as e:
+        logger.error(f"Error updating leaderboard: {str(e)}")
@@ -0,0 +1,144 @@
+import json
+from django.utils import timezone
+from .models import LatestQuote
+from .redis_client import get_async_redis, get_redis
+
+SCORES_KEY = 'stocks:leaderboard:change_percent'
+ENTRIES_KEY = 'stocks:leaderboard:entries'
+# stock_id -> epoch seconds of the tick each entry was taken from
+TIMES_KEY = 'stocks:leaderboard:times'
+TOP_KEY = 'stocks:leaderboard:top'
+LEADERBOARD_SIZE = 10
+# What leaderboard responses carry; entries also hold stream state such as seq
+LEADERBOARD_FIELDS = ['id', 'symbol', 'name', 'latest_price', 'change_percent']
+
+# Writes each entry (and its score, if it has one) unless the stock already
+# holds an entry from a later tick, then returns the top gainers and losers
+UPDATE_SCRIPT = """
+local timestamp = tonumber(ARGV[2])
+for i = 3, #ARGV, 3 do
+    local stock_id = ARGV[i]
+    local previous = redis.call('HGET', KEYS[3], stock_id)
+    if not previous or tonumber(previous) <= timestamp then
+        redis.call('HSET', KEYS[2], stock_id, ARGV[i + 1])
+        redis.call('HSET', KEYS[3], stock_id, ARGV[2])
+        if ARGV[i + 2] ~= '' then
+            redis.call('ZADD', KEYS[1], ARGV[i + 2], stock_id)
+        end
+    end
+end
+local size = tonumber(ARGV[1])
+return {redis.call('ZREVRANGE', KEYS[1], 0, size - 1), redis.call('ZRANGE', KEYS[1], 0, size - 1)}
+"""
+
+_update_script = None
+
+
+def update_leaderboard(entries, timestamp=None):
+    """Move each stock to its latest change_percent in the shared leaderboard.
+
+    ``entries`` are the stock dicts broadcast to websocket clients, taken
+    from ticks at ``timestamp`` (now by default). They are also kept in
+    ``ENTRIES_KEY`` as the latest state of every stock, which the websocket
+    snapshot is built from; an entry older than the one already stored for
+    its stock is ignored, so a late tick cannot overwrite a newer one.
+    Returns the new ``(gainer_ids, loser_ids)`` when the membership or order
+    of the top ``LEADERBOARD_SIZE`` changed, otherwise ``None``. The
+    previous top is kept in Redis so only one worker reports any given
+    change.
+    """
+    global _update_script
+    if not entries:
+        return None
+    if _update_script is None:
+        _update_script = get_redis().register_script(UPDATE_SCRIPT)
+    args = [LEADERBOARD_SIZE, repr((timestamp or timezone.now()).timestamp())]
+    for entry in entries:
+        change_percent = entry.get('change_percent')
+        args.extend((entry['id'], json.dumps(entry), '' if change_percent is None else repr(float(change_percent))))
+    gainers, losers = _update_script(keys=[SCORES_KEY, ENTRIES_KEY, TIMES_KEY], args=args)
+
+    top = json.dumps([[int(stock_id) for stock_id in gainers], [int(stock_id) for stock_id in losers]])
+    previous = get_redis().getset(TOP_KEY, top)
+    if previous is not None and previous.decode() == top:
+        return None
+    return json.loads(top)
+
+
+def get_leaderboard(side, limit=LEADERBOARD_SIZE):
+    """Return the top ``limit`` stock dicts for ``'gainers'`` or ``'losers'``.
+
+    Reads are O(log N + limit) and never touch the database.
+    """
+    redis = get_redis()
+    if side == 'gainers':
+        ids = redis.zrevrange(SCORES_KEY, 0, limit - 1)
+    else:
+        ids = redis.zrange(SCORES_KEY, 0, limit - 1)
+    if not ids:
+        return []
+    return [_leaderboard_entry(json.loads(entry)) for entry in redis.hmget(ENTRIES_KEY, ids) if entry is not None]
+
+
+def _leaderboard_entry(entry):
+    return {field: entry.get(field) for field in LEADERBOARD_FIELDS}
+
+
+def get_leaderboards(limit=LEADERBOARD_SIZE):
+    return {
+        'gainers': get_leaderboard('gainers', limit),
+        'losers': get_leaderboard('losers', limit),
+    }
+
+
+def _latest_quotes():
+    return LatestQuote.objects.filter(stock__is_active=True).values(
+        'stock_id', 'stock__symbol', 'stock__name', 'price', 'change_percent', 'timestamp'
+    )
+
+
+def _entry(quote):
+    return {
+        'id': quote['stock_id'],
+        'symbol': quote['stock__symbol'],
+        'name': quote['stock__name'],
+        'latest_price': float(quote['price']),
+        'change_percent': float(quote['change_percent']) if quote['change_percent'] is not None else None,
+    }
+
+
+def _reload(pipe, quotes):
+    entries = [_entry(quote) for quote in quotes]
+    pipe.delete(SCORES_KEY, ENTRIES_KEY, TIMES_KEY, TOP_KEY)
+    if entries:
+        pipe.hset(ENTRIES_KEY, mapping={entry['id']: json.dumps(entry) for entry in entries})
+        pipe.hset(TIMES_KEY, mapping={quote['stock_id']: repr(quote['timestamp'].timestamp()) for quote in quotes})
+    scores = {entry['id']: entry['change_percent'] for entry in entries if entry['change_percent'] is not None}
+    if scores:
+        pipe.zadd(SCORES_KEY, scores)
+
+
+def rebuild_leaderboard():
+    """Reload the leaderboard from LatestQuote, e.g. after Redis was flushed"""
+    quotes = list(_latest_quotes())
+    pipe = get_redis().pipeline()
+    _reload(pipe, quotes)
+    pipe.execute()
+    return len(quotes)
+
+
+async def arebuild_leaderboard():
+    """Async rebuild_leaderboard() for websocket consumers"""
+    quotes = [quote async for quote in _latest_quotes()]
+    pipe = get_async_redis().pipeline()
+    _reload(pipe, quotes)
+    await pipe.execute()
+    return len(quotes)
+
+
+def remove_from_leaderboard(stock_id):
+    pipe = get_redis().pipeline()
+    pipe.zrem(SCORES_KEY, stock_id)
+    pipe.hdel(ENTRIES_KEY, stock_id)
+    pipe.hdel(TIMES_KEY, stock_id)
+    pipe.execute()
@@ -0,0 +1,61 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from stocks.buffer import flush_tick_buffer
+from stocks.ingestion import ingest_quote, ingest_quotes
+from stocks.providers import get_provider
+from stocks.tasks import STOCK_SYMBOLS
+
+
+class Command(BaseCommand):
+    help = 'Push synthetic or replayed ticks through the ingestion pipeline and report throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--provider', choices=['synthetic', 'replay'], default='synthetic')
+        parser.add_argument('--file', help='CSV file to replay (replay provider)')
+        parser.add_argument('--symbols', nargs='+', default=STOCK_SYMBOLS)
+        parser.add_argument('--count', type=int, default=10000, help='Number of ticks to ingest')
+        parser.add_argument('--rate', type=float, default=0, help='Target ticks per second (0 = as fast as possible)')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=0,
+                            help='Ingest ticks in batches of this many symbols (0 = one tick at a time)')
+
+    def handle(self, *args, **options):
+        if options['provider'] == 'replay':
+            if not options['file']:
+                raise CommandError('--file is required for the replay provider')
+            provider = get_provider('replay', path=options['file'])
+        else:
+            provider = get_provider('synthetic', seed=options['seed'])
+
+        count = options['count']
+        batch_size = options['batch_size']
+        interval = 1 / options['rate'] if options['rate'] else 0
+
+        ingested = 0
+        batch = {}
+        started = time.perf_counter()
+        for symbol, price_data in provider.stream(options['symbols']):
+            if ingested >= count:
+                break
+            if batch_size:
+                if symbol in batch or len(batch) >= batch_size:
+                    ingest_quotes(batch)
+                    batch = {}
+                batch[symbol] = price_data
+            else:
+                ingest_quote(symbol, price_data)
+            ingested += 1
+
+            if interval:
+                # Pace against the schedule rather than sleeping a fixed amount per tick
+                delay = started + ingested * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+        ingest_quotes(batch)
+        flush_tick_buffer()
+        elapsed = time.perf_counter() - started
+        rate = ingested / elapsed if elapsed else 0
+        self.stdout.write(
+            self.style.SUCCESS(f'Ingested {ingested} ticks in {elapsed:.2f}s ({rate:.0f} ticks/s)')
+        )
@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+# Partitions created up front; stocks.tasks.maintain_price_partitions keeps
+# creating them ahead of time from then on.
+DAYS_BEHIND = 7
+DAYS_AHEAD = 7
+
+
+def partition_stockprice(apps, schema_editor):
+    """Rebuild stocks_stockprice as a table range-partitioned by day on timestamp.
+
+    PostgreSQL only: other backends keep the plain table and the row-delete
+    retention path. Identity columns are not allowed on partitioned tables
+    before PostgreSQL 17, so ids come from a plain sequence. The primary key
+    has to include the partition key, so it becomes (id, timestamp).
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    table = 'stocks_stockprice'
+    fk_index = schema_editor._create_index_name(table, ['stock_id'])
+    today = timezone.now().date()
+
+    statements = [
+        f'ALTER TABLE "{table}" RENAME TO "{table}_old"',
+        f'ALTER TABLE "{table}_old" ALTER COLUMN "id" DROP IDENTITY IF EXISTS',
+        f'ALTER TABLE "{table}_old" RENAME CONSTRAINT "{table}_pkey" TO "{table}_old_pkey"',
+        f'CREATE SEQUENCE "{table}_id_seq"',
+        f'''CREATE TABLE "{table}" (
+            "id" bigint NOT NULL DEFAULT nextval('{table}_id_seq'),
+            "stock_id" bigint NOT NULL,
+            "price" numeric(10, 2) NOT NULL,
+            "volume" bigint NULL,
+            "open_price" numeric(10, 2) NULL,
+            "high_price" numeric(10, 2) NULL,
+            "low_price" numeric(10, 2) NULL,
+            "previous_close" numeric(10, 2) NULL,
+            "change" numeric(10, 2) NULL,
+            "change_percent" numeric(5, 2) NULL,
+            "timestamp" timestamp with time zone NOT NULL,
+            CONSTRAINT "{table}_pkey" PRIMARY KEY ("id", "timestamp")
+        ) PARTITION BY RANGE ("timestamp")''',
+        f'ALTER SEQUENCE "{table}_id_seq" OWNED BY "{table}"."id"',
+        f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT',
+    ]
+    for offset in range(-DAYS_BEHIND, DAYS_AHEAD + 1):
+        day = today + timedelta(days=offset)
+        statements.append(
+            f'CREATE TABLE "{table}_p{day:%Y%m%d}" PARTITION OF "{table}" '
+            f"FOR VALUES FROM ('{day.isoformat()} 00:00:00+00') "
+            f"TO ('{(day + timedelta(days=1)).isoformat()} 00:00:00+00')"
+        )
+    statements += [
+        f'''INSERT INTO "{table}" ("id", "stock_id", "price", "volume", "open_price", "high_price",
+                "low_price", "previous_close", "change", "change_percent", "timestamp")
+            SELECT "id", "stock_id", "price", "volume", "open_price", "high_price",
+                "low_price", "previous_close", "change", "change_percent", "timestamp"
+            FROM "{table}_old"''',
+        f'''SELECT setval('{table}_id_seq', COALESCE((SELECT MAX("id") FROM "{table}"), 0) + 1, false)''',
+        f'DROP TABLE "{table}_old"',
+        f'''ALTER TABLE "{table}" ADD CONSTRAINT "{fk_index}_fk_stocks_stock_id"
+            FOREIGN KEY ("stock_id") REFERENCES "stocks_stock" ("id") DEFERRABLE INITIALLY DEFERRED''',
+        f'CREATE INDEX "{fk_index}" ON "{table}" ("stock_id")',
+        f'CREATE INDEX "stocks_stoc_stock_i_71a6f4_idx" ON "{table}" ("stock_id", "timestamp" DESC)',
+        f'CREATE INDEX "stocks_stoc_timesta_a6339a_idx" ON "{table}" ("timestamp" DESC)',
+    ]
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0002_stockprice_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_stockprice, migrations.RunPython.noop),
+    ]
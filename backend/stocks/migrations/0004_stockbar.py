@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0003_partition_stockprice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockBar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('interval', models.CharField(choices=[('1m', '1 Minute'), ('5m', '5 Minutes'), ('1h', '1 Hour'), ('1d', '1 Day')], max_length=3)),
+                ('start', models.DateTimeField()),
+                ('open_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('high_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('low_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('close_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('volume', models.BigIntegerField(default=0)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bars', to='stocks.stock')),
+            ],
+            options={
+                'ordering': ['-start'],
+                'unique_together': {('stock', 'interval', 'start')},
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_latest_quotes(apps, schema_editor):
+    """Seed LatestQuote from each stock's newest StockPrice"""
+    Stock = apps.get_model('stocks', 'Stock')
+    StockPrice = apps.get_model('stocks', 'StockPrice')
+    LatestQuote = apps.get_model('stocks', 'LatestQuote')
+
+    quotes = []
+    for stock_id in Stock.objects.values_list('id', flat=True):
+        latest = StockPrice.objects.filter(stock_id=stock_id).order_by('-timestamp').first()
+        if latest:
+            quotes.append(LatestQuote(
+                stock_id=stock_id,
+                price=latest.price,
+                volume=latest.volume,
+                change=latest.change,
+                change_percent=latest.change_percent,
+                timestamp=latest.timestamp,
+            ))
+    LatestQuote.objects.bulk_create(quotes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0004_stockbar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestQuote',
+            fields=[
+                ('stock', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latest_quote', serialize=False, to='stocks.stock')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('volume', models.BigIntegerField(blank=True, null=True)),
+                ('change', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('change_percent', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('timestamp', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-change_percent'], name='stocks_late_change__55e208_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_latest_quotes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0005_latestquote'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockbar',
+            name='close_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stockhistoricaldata',
+            name='close_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
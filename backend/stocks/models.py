@@ -1,5 +1,8 @@
+from datetime import timedelta
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class Stock(models.Model):
@@ -19,6 +22,13 @@ class Stock(models.Model):
         return f"{self.symbol} - {self.name}"
 
 
+class StockPriceQuerySet(models.QuerySet):
+    def recent(self, days=None):
+        """Limit to the last ``days`` days so only recent partitions are scanned"""
+        days = days or settings.PRICE_RETENTION_DAYS
+        return self.filter(timestamp__gte=timezone.now() - timedelta(days=days))
+
+
 class StockPrice(models.Model):
     stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='prices')
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -29,7 +39,10 @@ class StockPrice(models.Model):
     previous_close = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     change = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     change_percent = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the tick is received rather than when a buffered write lands
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    objects = StockPriceQuerySet.as_manager()
 
     class Meta:
         ordering = ['-timestamp']
@@ -42,6 +55,28 @@ class StockPrice(models.Model):
         return f"{self.stock.symbol} - ${self.price} at {self.timestamp}"
 
 
+class LatestQuote(models.Model):
+    """Most recent tick per stock, kept up to date by the tick buffer.
+
+    Lets list endpoints and websocket snapshots read current prices with a
+    join instead of one ``prices.first()`` query per stock.
+    """
+    stock = models.OneToOneField(Stock, on_delete=models.CASCADE, primary_key=True, related_name='latest_quote')
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    volume = models.BigIntegerField(blank=True, null=True)
+    change = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    change_percent = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True)
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-change_percent']),
+        ]
+
+    def __str__(self):
+        return f"{self.stock_id} - ${self.price} at {self.timestamp}"
+
+
 class StockHistoricalData(models.Model):
     stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='historical_data')
     date = models.DateField()
@@ -51,6 +86,8 @@ class StockHistoricalData(models.Model):
     close_price = models.DecimalField(max_digits=10, decimal_places=2)
     volume = models.BigIntegerField()
     adjusted_close = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    # Time of the tick the close came from, for rows rolled up from ticks
+    close_at = models.DateTimeField(blank=True, null=True)
 
     class Meta:
         unique_together = ['stock', 'date']
@@ -62,3 +99,31 @@ class StockHistoricalData(models.Model):
     def __str__(self):
         return f"{self.stock.symbol} - {self.date} - ${self.close_price}"
 
+
+
+class StockBar(models.Model):
+    """OHLCV bar rolled up from ingested ticks"""
+    INTERVALS = [
+        ('1m', '1 Minute'),
+        ('5m', '5 Minutes'),
+        ('1h', '1 Hour'),
+        ('1d', '1 Day'),
+    ]
+
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='bars')
+    interval = models.CharField(max_length=3, choices=INTERVALS)
+    start = models.DateTimeField()
+    open_price = models.DecimalField(max_digits=10, decimal_places=2)
+    high_price = models.DecimalField(max_digits=10, decimal_places=2)
+    low_price = models.DecimalField(max_digits=10, decimal_places=2)
+    close_price = models.DecimalField(max_digits=10, decimal_places=2)
+    volume = models.BigIntegerField(default=0)
+    # Time of the tick the close came from
+    close_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        unique_together = ['stock', 'interval', 'start']
+        ordering = ['-start']
+
+    def __str__(self):
+        return f"{self.stock.symbol} - {self.interval} - {self.start} - ${self.close_price}"
@@ -0,0 +1,108 @@
+import asyncio
+import itertools
+import time
+
+
+class Outbox:
+    """Per-connection send queue between channel layer handlers and the socket.
+
+    Handlers ``put`` frames and return at once, so the connection's channel
+    layer queue keeps draining even when the client is slow. A single writer
+    task sends the queued frames in order. With ``conflate`` on, a frame with
+    the same key as one still waiting (e.g. the same symbol's last tick)
+    replaces it instead of queueing behind it.
+
+    A frame is text, bytes, or a callable returning either; callables are
+    only called when the frame is sent, which suits per-client encodings
+    that depend on what the client has already been sent.
+
+    ``put`` returns ``False`` once the client is too far behind: more than
+    ``max_pending`` frames waiting, or no frame accepted by the socket for
+    ``max_lag`` seconds while frames wait. The caller should close the
+    connection at that point.
+
+    Frames only wait here while ``send`` is blocked, so all of the above
+    depends on the ASGI server's websocket send waiting for the transport
+    to drain. uvicorn's ``websockets`` implementation does, and is what the
+    app is served with; servers that buffer every frame instead (Daphne,
+    uvicorn's ``wsproto``) never let the queue build up.
+    """
+
+    def __init__(self, send, conflate=True, max_pending=1000, max_lag=10.0):
+        self._send = send
+        self.conflate = conflate
+        self.max_pending = max_pending
+        self.max_lag = max_lag
+        self._pending = {}
+        self._unique = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._progress_at = time.monotonic()
+        self._task = None
+        self.sent = 0
+        self.conflated = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self):
+        return len(self._pending)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """Stop the writer; frames still waiting are counted as dropped"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.dropped += len(self._pending)
+        self._pending = {}
+
+    def put(self, frame, key=None):
+        """Queue ``frame``; frames with a ``key`` may be conflated"""
+        if self._pending and time.monotonic() - self._progress_at > self.max_lag:
+            self.dropped += 1
+            return False
+
+        if key is None or not self.conflate:
+            key = next(self._unique)
+        if key in self._pending:
+            self.conflated += 1
+        elif len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+        elif not self._pending:
+            self._progress_at = time.monotonic()
+
+        self._pending[key] = frame
+        self.max_depth = max(self.max_depth, len(self._pending))
+        self._wakeup.set()
+        return True
+
+    def stats(self):
+        return {
+            'conflate': self.conflate,
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'sent': self.sent,
+            'conflated': self.conflated,
+            'dropped': self.dropped,
+        }
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._pending:
+                key = next(iter(self._pending))
+                frame = self._pending.pop(key)
+                if callable(frame):
+                    frame = frame()
+                await self._send(frame)
+                self.sent += 1
+                self._progress_at = time.monotonic()
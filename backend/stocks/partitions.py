@@ -0,0 +1,139 @@
+import re
+from datetime import datetime, timedelta
+import logging
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import StockPrice
+
+logger = logging.getLogger(__name__)
+
+TABLE = StockPrice._meta.db_table
+PARTITION_RE = re.compile(rf'^{TABLE}_p(\d{{8}})$')
+
+
+def is_partitioned():
+    """Whether StockPrice is stored as a range-partitioned PostgreSQL table"""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass",
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def partition_name(day):
+    return f'{TABLE}_p{day:%Y%m%d}'
+
+
+def list_partitions():
+    """Return ``{day: partition_name}`` for the daily partitions that exist"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = {}
+    for name in names:
+        match = PARTITION_RE.match(name)
+        if match:
+            day = datetime.strptime(match.group(1), '%Y%m%d').date()
+            partitions[day] = name
+    return partitions
+
+
+def ensure_partitions(days_ahead):
+    """Create the daily partitions from today through ``days_ahead`` days out.
+
+    Days whose rows already landed in the default partition (e.g. while
+    this task was not running) get their partition too, and those rows are
+    moved into it.
+    """
+    existing = list_partitions()
+    today = timezone.now().date()
+    days = {today + timedelta(days=offset) for offset in range(days_ahead + 1)}
+    days.update(default_partition_days())
+    created = []
+    for day in sorted(days - set(existing)):
+        create_partition(day)
+        created.append(partition_name(day))
+    return created
+
+
+def default_partition_days():
+    """Return the days that have rows in the default partition"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""SELECT DISTINCT ("timestamp" AT TIME ZONE 'UTC')::date FROM "{TABLE}_default" """
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def create_partition(day):
+    """Create the partition for ``day``, moving its rows out of the default partition.
+
+    PostgreSQL refuses to create a partition for a range the default
+    partition holds rows in, so those rows are moved into a new table that
+    is then attached. The default partition stays locked throughout, so no
+    row can land in it in between.
+    """
+    name = partition_name(day)
+    start = f'{day.isoformat()} 00:00:00+00'
+    end = f'{(day + timedelta(days=1)).isoformat()} 00:00:00+00'
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE "{TABLE}_default" IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(
+            f'SELECT EXISTS (SELECT 1 FROM "{TABLE}_default" WHERE "timestamp" >= %s AND "timestamp" < %s)',
+            [start, end],
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(
+                f'CREATE TABLE "{name}" PARTITION OF "{TABLE}" '
+                f"FOR VALUES FROM ('{start}') TO ('{end}')"
+            )
+            return
+        cursor.execute(f'CREATE TABLE "{name}" (LIKE "{TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(
+            f"""WITH moved AS (
+                DELETE FROM "{TABLE}_default" WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *
+            )
+            INSERT INTO "{name}" SELECT * FROM moved""",
+            [start, end],
+        )
+        logger.info(f"Moved {cursor.rowcount} rows from the default partition into {name}")
+        cursor.execute(
+            f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" '
+            f"FOR VALUES FROM ('{start}') TO ('{end}')"
+        )
+
+
+def drop_old_partitions(retention_days):
+    """Detach and drop partitions that lie entirely before the retention cutoff.
+
+    Rows that ended up in the default partition are still deleted row by
+    row, but that partition only holds stragglers outside the daily ranges.
+    """
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    dropped = []
+    for day, name in sorted(list_partitions().items()):
+        if day + timedelta(days=1) > cutoff.date():
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+            cursor.execute(f'DROP TABLE "{name}"')
+        dropped.append(name)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM "{TABLE}_default" WHERE "timestamp" < %s', [cutoff])
+        stragglers = cursor.rowcount
+
+    return dropped, stragglers
@@ -0,0 +1,68 @@
+import msgpack
+
+# Offered by clients in Sec-WebSocket-Protocol to get binary frames
+MSGPACK_SUBPROTOCOL = 'stocks.msgpack.v1'
+
+# First element of every data frame
+SNAPSHOT = 0
+UPDATE = 1
+BATCH = 2
+LEADERBOARD = 3
+
+# Fields that change tick to tick, by their index on the wire
+DELTA_FIELDS = ['latest_price', 'change_percent', 'seq']
+
+
+class DeltaEncoder:
+    """MessagePack encoder for one connection that sends only changed fields.
+
+    Data frames are arrays tagged with a frame type and refer to stocks by
+    their numeric id:
+
+    - ``[SNAPSHOT, [[id, symbol, name, latest_price, change_percent, seq], ...], seq]``
+    - ``[UPDATE, id, {field_index: value}]``, followed by ``symbol, name``
+      the first time an id is sent
+    - ``[BATCH, [[id, {field_index: value}, ...], ...]]``, also used to
+      replay missed updates on resume
+    - ``[LEADERBOARD, [snapshot row, ...], [snapshot row, ...]]``
+
+    Control messages (confirmations, stats, errors) are maps with the same
+    keys as their JSON form. Deltas are computed against what this client
+    was last sent, so encode at send time, after any conflation.
+    """
+
+    def __init__(self):
+        self._last = {}
+
+    def _row(self, stock):
+        values = [stock.get(field) for field in DELTA_FIELDS]
+        self._last[stock['id']] = values
+        return [stock['id'], stock['symbol'], stock['name'], *values]
+
+    def _delta(self, stock):
+        values = [stock.get(field) for field in DELTA_FIELDS]
+        last = self._last.get(stock['id'])
+        self._last[stock['id']] = values
+        if last is None:
+            return [stock['id'], dict(enumerate(values)), stock['symbol'], stock['name']]
+        changes = {index: value for index, (value, previous) in enumerate(zip(values, last)) if value != previous}
+        return [stock['id'], changes]
+
+    def snapshot(self, stocks, seq=None):
+        return msgpack.packb([SNAPSHOT, [self._row(stock) for stock in stocks], seq])
+
+    def update(self, stock):
+        return msgpack.packb([UPDATE, *self._delta(stock)])
+
+    def batch(self, stocks):
+        return msgpack.packb([BATCH, [self._delta(stock) for stock in stocks]])
+
+    def leaderboard(self, data):
+        return msgpack.packb([
+            LEADERBOARD,
+            [self._row(stock) for stock in data['gainers']],
+            [self._row(stock) for stock in data['losers']],
+        ])
+
+    def message(self, content):
+        return msgpack.packb(content)
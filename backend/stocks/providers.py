@@ -0,0 +1,242 @@
+import csv
+import itertools
+import random
+import threading
+import requests
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+PRICE_FIELDS = [
+    'price', 'volume', 'open_price', 'high_price', 'low_price',
+    'previous_close', 'change', 'change_percent',
+]
+
+
+class QuoteProvider:
+    """Base class for market data sources.
+
+    ``fetch_quote`` returns a ``price_data`` dict with the keys in
+    ``PRICE_FIELDS`` (or ``None`` when the source has nothing for the
+    symbol), which is what the ingestion pipeline persists and broadcasts.
+    """
+
+    name = None
+
+    def is_configured(self):
+        return True
+
+    def fetch_quote(self, symbol):
+        raise NotImplementedError
+
+    def fetch_quotes(self, symbols):
+        """Fetch a batch of symbols, returning ``{symbol: price_data}``"""
+        quotes = {}
+        for symbol in symbols:
+            price_data = self._fetch_or_log(symbol)
+            if price_data:
+                quotes[symbol] = price_data
+        return quotes
+
+    def _fetch_or_log(self, symbol):
+        try:
+            return self.fetch_quote(symbol)
+        except Exception as e:
+            logger.error(f"Error fetching data for {symbol}: {str(e)}")
+            return None
+
+    def stream(self, symbols):
+        """Yield ``(symbol, price_data)`` ticks, cycling through ``symbols``"""
+        for symbol in itertools.cycle(symbols):
+            price_data = self.fetch_quote(symbol)
+            if price_data:
+                yield symbol, price_data
+
+
+class AlphaVantageProvider(QuoteProvider):
+    """Real-time quotes from the Alpha Vantage GLOBAL_QUOTE endpoint"""
+
+    name = 'alphavantage'
+    url = "https://www.alphavantage.co/query"
+
+    def __init__(self, api_key=None, concurrency=None):
+        self.api_key = api_key if api_key is not None else settings.ALPHA_VANTAGE_API_KEY
+        self.concurrency = concurrency or settings.QUOTE_FETCH_CONCURRENCY
+        self._session = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def is_configured(self):
+        return bool(self.api_key)
+
+    @property
+    def session(self):
+        """Keep-alive session shared by every request made from this process"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+                    session.mount('https://', adapter)
+                    self._session = session
+        return self._session
+
+    def fetch_quote(self, symbol):
+        params = {
+            'function': 'GLOBAL_QUOTE',
+            'symbol': symbol,
+            'apikey': self.api_key
+        }
+        response = self.session.get(self.url, params=params, timeout=10)
+        response.raise_for_status()
+        return self.parse_quote(response.json())
+
+    def fetch_quotes(self, symbols):
+        """Fetch symbols concurrently on a bounded pool over pooled connections"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.concurrency,
+                        thread_name_prefix='quote-fetch',
+                    )
+        results = self._executor.map(self._fetch_or_log, symbols)
+        return {symbol: price_data for symbol, price_data in zip(symbols, results) if price_data}
+
+    @staticmethod
+    def parse_quote(data):
+        """Convert a GLOBAL_QUOTE response into ``price_data``"""
+        quote_data = data.get('Global Quote')
+        if not quote_data:
+            return None
+        return {
+            'price': float(quote_data.get('05. price', 0)),
+            'volume': int(quote_data.get('06. volume', 0)),
+            'open_price': float(quote_data.get('02. open', 0)),
+            'high_price': float(quote_data.get('03. high', 0)),
+            'low_price': float(quote_data.get('04. low', 0)),
+            'previous_close': float(quote_data.get('08. previous close', 0)),
+            'change': float(quote_data.get('09. change', 0)),
+            'change_percent': float(quote_data.get('10. change percent', '0').rstrip('%'))
+        }
+
+
+class SyntheticProvider(QuoteProvider):
+    """Random-walk quote generator for load tests; needs no network"""
+
+    name = 'synthetic'
+
+    def __init__(self, seed=None, volatility=0.001):
+        self.random = random.Random(seed)
+        self.volatility = volatility
+        self.state = {}
+
+    def fetch_quote(self, symbol):
+        state = self.state.get(symbol)
+        if state is None:
+            price = round(self.random.uniform(20, 500), 2)
+            state = self.state[symbol] = {
+                'previous_close': price,
+                'open_price': price,
+                'high_price': price,
+                'low_price': price,
+                'price': price,
+                'volume': 0,
+            }
+
+        price = state['price'] * (1 + self.random.gauss(0, self.volatility))
+        price = round(max(price, 0.01), 2)
+        state['price'] = price
+        state['high_price'] = max(state['high_price'], price)
+        state['low_price'] = min(state['low_price'], price)
+        state['volume'] += self.random.randint(100, 10000)
+
+        change = price - state['previous_close']
+        return {
+            **state,
+            'change': round(change, 2),
+            'change_percent': round(change / state['previous_close'] * 100, 2),
+        }
+
+
+class ReplayProvider(QuoteProvider):
+    """Replays recorded ticks from a CSV file.
+
+    The file needs a ``symbol`` column plus any of the ``PRICE_FIELDS``
+    columns; ``stream`` yields ticks in file order, and ``fetch_quote``
+    returns the next recorded tick for a symbol.
+    """
+
+    name = 'replay'
+
+    def __init__(self, path=None, loop=True):
+        self.path = path or settings.MARKET_DATA_REPLAY_FILE
+        self.loop = loop
+        self.ticks = self._load(self.path)
+        self.by_symbol = {}
+        for symbol, price_data in self.ticks:
+            self.by_symbol.setdefault(symbol, []).append(price_data)
+        self.positions = {}
+
+    @staticmethod
+    def _load(path):
+        ticks = []
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                price_data = {}
+                for field in PRICE_FIELDS:
+                    value = row.get(field)
+                    if value in (None, ''):
+                        price_data[field] = 0
+                    elif field == 'volume':
+                        price_data[field] = int(float(value))
+                    else:
+                        price_data[field] = float(value)
+                ticks.append((row['symbol'], price_data))
+        return ticks
+
+    def is_configured(self):
+        return bool(self.ticks)
+
+    def fetch_quote(self, symbol):
+        recorded = self.by_symbol.get(symbol)
+        if not recorded:
+            return None
+        position = self.positions.get(symbol, 0)
+        if position >= len(recorded):
+            if not self.loop:
+                return None
+            position = 0
+        self.positions[symbol] = position + 1
+        return dict(recorded[position])
+
+    def stream(self, symbols=None):
+        wanted = set(symbols) if symbols else None
+        while True:
+            for symbol, price_data in self.ticks:
+                if wanted is None or symbol in wanted:
+                    yield symbol, dict(price_data)
+            if not self.loop:
+                return
+
+
+PROVIDERS = {
+    AlphaVantageProvider.name: AlphaVantageProvider,
+    SyntheticProvider.name: SyntheticProvider,
+    ReplayProvider.name: ReplayProvider,
+}
+
+_provider = None
+
+
+def get_provider(name=None, **kwargs):
+    """Return a provider by name, or the configured one (cached per process)"""
+    global _provider
+    if name is not None:
+        return PROVIDERS[name](**kwargs)
+    if _provider is None:
+        _provider = PROVIDERS[settings.MARKET_DATA_PROVIDER]()
+    return _provider
@@ -0,0 +1,74 @@
+from django.conf import settings
+from .redis_client import get_redis
+
+# Reserve up to ARGV[4] slots from a GCRA-style token bucket and return the
+# delay (seconds from now) of each slot. The bucket state is a single
+# "theoretical arrival time" so every worker shares the same schedule, and
+# Redis' own clock is used so worker clock skew does not matter.
+RESERVE_SCRIPT = """
+local key = KEYS[1]
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local horizon = tonumber(ARGV[3])
+local count = tonumber(ARGV[4])
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local tat = tonumber(redis.call('GET', key))
+if not tat or tat < now then
+    tat = now
+end
+
+local tolerance = interval * (burst - 1)
+local delays = {}
+for i = 1, count do
+    local delay = tat - tolerance - now
+    if delay < 0 then
+        delay = 0
+    end
+    if delay >= horizon then
+        break
+    end
+    delays[#delays + 1] = tostring(delay)
+    tat = tat + interval
+end
+
+local ttl = math.ceil((tat - now + interval) * 1000)
+redis.call('SET', key, tostring(tat), 'PX', ttl)
+return delays
+"""
+
+
+class TokenBucket:
+    """Token bucket kept in Redis and shared by every worker process.
+
+    Instead of blocking until a token is free, callers reserve future slots
+    and get back the countdown for each one, which maps directly onto
+    Celery's ``apply_async(countdown=...)``.
+    """
+
+    def __init__(self, key, rate, period, burst=1):
+        self.key = key
+        self.interval = period / rate
+        self.burst = max(1, burst)
+        self._script = None
+
+    def reserve(self, count, horizon):
+        """Reserve up to ``count`` slots that start within the next ``horizon`` seconds"""
+        if count <= 0:
+            return []
+        if self._script is None:
+            self._script = get_redis().register_script(RESERVE_SCRIPT)
+        delays = self._script(keys=[self.key], args=[self.interval, self.burst, horizon, count])
+        return [float(delay) for delay in delays]
+
+
+def get_quote_bucket():
+    """Token bucket guarding the market data provider's request quota"""
+    return TokenBucket(
+        'stocks:ratelimit:quotes',
+        rate=settings.QUOTE_RATE_LIMIT,
+        period=settings.QUOTE_RATE_PERIOD,
+        burst=settings.QUOTE_RATE_BURST,
+    )
@@ -0,0 +1,29 @@
+import asyncio
+import weakref
+import redis
+import redis.asyncio
+from django.conf import settings
+
+_client = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_redis():
+    """Return the process-wide Redis client used for shared ingestion state"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL)
+    return _client
+
+
+def get_async_redis():
+    """Return an asyncio Redis client for the running event loop.
+
+    asyncio connections belong to the loop that opened them, so websocket
+    consumers get one client per loop rather than a process-wide one.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = redis.asyncio.Redis.from_url(settings.REDIS_URL)
+    return client
@@ -0,0 +1,77 @@
+import json
+from django.conf import settings
+from .redis_client import get_async_redis, get_redis
+
+SEQ_KEY = 'stocks:stream:seq'
+RING_KEY = 'stocks:stream:ring'
+
+
+# Reserves a block of sequence numbers and records the updates under them in
+# one step, so the ring never holds a later seq without the earlier ones.
+# Members are 'seq:json' with the seq kept out of the JSON.
+SEQUENCE_SCRIPT = """
+local count = #ARGV - 1
+local last = redis.call('INCRBY', KEYS[1], count)
+for i = 1, count do
+    local seq = last - count + i
+    redis.call('ZADD', KEYS[2], seq, seq .. ':' .. ARGV[i + 1])
+end
+redis.call('ZREMRANGEBYRANK', KEYS[2], 0, -tonumber(ARGV[1]) - 1)
+return last
+"""
+
+_sequence_script = None
+
+
+def sequence_updates(updates):
+    """Stamp each update with the next global sequence number and record it.
+
+    The last WEBSOCKET_REPLAY_SIZE updates are kept in a Redis sorted set
+    scored by sequence, so reconnecting clients can be sent what they
+    missed instead of a full snapshot.
+    """
+    global _sequence_script
+    if not updates:
+        return updates
+    if _sequence_script is None:
+        _sequence_script = get_redis().register_script(SEQUENCE_SCRIPT)
+    last = _sequence_script(
+        keys=[SEQ_KEY, RING_KEY],
+        args=[settings.WEBSOCKET_REPLAY_SIZE, *(json.dumps(update) for update in updates)],
+    )
+    for seq, update in enumerate(updates, start=last - len(updates) + 1):
+        update['seq'] = seq
+    return updates
+
+
+def _ring_update(member):
+    seq, _, data = member.partition(b':')
+    update = json.loads(data)
+    update['seq'] = int(seq)
+    return update
+
+
+async def updates_since(last_seq):
+    """Return the latest update per stock after ``last_seq``, and the current sequence.
+
+    Returns ``(None, seq)`` when the ring no longer reaches back to
+    ``last_seq`` (or the sequence was reset), meaning the client needs a
+    full snapshot instead.
+    """
+    pipe = get_async_redis().pipeline()
+    pipe.get(SEQ_KEY)
+    pipe.zrange(RING_KEY, 0, 0, withscores=True)
+    pipe.zrangebyscore(RING_KEY, f'({last_seq}', '+inf')
+    seq, oldest, members = await pipe.execute()
+    seq = int(seq or 0)
+
+    if last_seq > seq:
+        return None, seq
+    if last_seq < seq and (not oldest or oldest[0][1] > last_seq + 1):
+        return None, seq
+
+    latest = {}
+    for member in members:
+        update = _ring_update(member)
+        latest[update['id']] = update
+    return sorted(latest.values(), key=lambda update: update['seq']), seq
@@ -0,0 +1,168 @@
+from datetime import datetime, timezone
+from django.db import connection
+from .models import StockBar, StockHistoricalData
+
+INTERVAL_SECONDS = {
+    '1m': 60,
+    '5m': 300,
+    '1h': 3600,
+    '1d': 86400,
+}
+
+# Providers report the session's cumulative volume, so intraday bars get the
+# increase over the highest volume already booked for the stock's day. That
+# high-water mark is the volume of the day's 1d bar: it is read and advanced
+# in the same transaction as the bars, with the batch's stocks locked until
+# it commits, so concurrent workers never book the same volume twice and a
+# failed write books nothing. A tick at or below the mark (a repeat, or an
+# older tick landing late) adds nothing, and a new day starts from zero.
+ROLLUP_LOCK = 0x524f4c4c  # advisory lock class for per-stock rollups
+
+DAY_SECONDS = INTERVAL_SECONDS['1d']
+
+
+def _lock_stocks(stock_ids):
+    """Hold a transaction-level lock on each stock, in id order to avoid deadlocks"""
+    if connection.vendor != 'postgresql':
+        # SQLite lets one writer in at a time anyway
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(%s, (stock_id %% 2147483648)::int) FROM unnest(%s::bigint[]) AS stock_id",
+            [ROLLUP_LOCK, sorted(stock_ids)],
+        )
+
+
+def _booked_volumes(rows):
+    """Return ``{(stock_id, day_epoch): volume}`` already booked in the 1d bars of ``rows``' days"""
+    days = {(stock_id, _day(timestamp)) for stock_id, price_data, timestamp in rows}
+    booked = StockBar.objects.filter(
+        interval='1d',
+        stock_id__in={stock_id for stock_id, day in days},
+        start__in={_from_epoch(day) for stock_id, day in days},
+    ).values_list('stock_id', 'start', 'volume')
+    return {(stock_id, int(start.timestamp())): volume for stock_id, start, volume in booked}
+
+
+def _day(timestamp):
+    epoch = int(timestamp.timestamp())
+    return epoch - epoch % DAY_SECONDS
+
+
+def fold_ticks(rows, booked):
+    """Fold time-ordered ``(stock_id, price_data, timestamp)`` rows into partial bars.
+
+    ``booked`` maps ``(stock_id, day_epoch)`` to the volume already booked
+    for that day (see ``_booked_volumes``). Returns
+    ``{(stock_id, interval, start_epoch): [open, high, low, close, volume, close_at]}``
+    where ``volume`` is the summed increase for intraday bars and the latest
+    cumulative session volume for daily bars, and ``close_at`` is the time
+    of the tick the close came from.
+    """
+    bars = {}
+    booked = dict(booked)
+    for stock_id, price_data, timestamp in rows:
+        price = price_data['price']
+        volume = int(price_data.get('volume') or 0)
+        epoch = int(timestamp.timestamp())
+        day = (stock_id, epoch - epoch % DAY_SECONDS)
+        delta = max(volume - booked.get(day, 0), 0)
+        if delta:
+            booked[day] = volume
+        for interval, seconds in INTERVAL_SECONDS.items():
+            key = (stock_id, interval, epoch - epoch % seconds)
+            bar = bars.get(key)
+            bar_volume = volume if interval == '1d' else delta
+            if bar is None:
+                bars[key] = [price, price, price, price, bar_volume, timestamp]
+            else:
+                bar[1] = max(bar[1], price)
+                bar[2] = min(bar[2], price)
+                bar[3] = price
+                bar[4] = max(bar[4], bar_volume) if interval == '1d' else bar[4] + bar_volume
+                bar[5] = timestamp
+    return bars
+
+
+def _from_epoch(epoch):
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+
+def _greatest_least():
+    if connection.vendor == 'postgresql':
+        return 'GREATEST', 'LEAST'
+    return 'MAX', 'MIN'
+
+
+def _latest_close(table):
+    """SET clauses that keep the close of whichever tick is later, the stored one or the new one"""
+    newer = f'{table}.close_at IS NULL OR EXCLUDED.close_at >= {table}.close_at'
+    return (
+        f'close_price = CASE WHEN {newer} THEN EXCLUDED.close_price ELSE {table}.close_price END, '
+        f'close_at = CASE WHEN {newer} THEN EXCLUDED.close_at ELSE {table}.close_at END'
+    )
+
+
+def upsert(cursor, insert, conflict, values):
+    """Run one multi-row upsert on PostgreSQL, or one statement per row elsewhere"""
+    if not values:
+        return
+    if connection.vendor == 'postgresql':
+        from psycopg2.extras import execute_values
+        execute_values(cursor.cursor, f'{insert} VALUES %s {conflict}', values, page_size=1000)
+    else:
+        placeholders = ', '.join(['%s'] * len(values[0]))
+        cursor.executemany(f'{insert} VALUES ({placeholders}) {conflict}', values)
+
+
+def update_bars(rows):
+    """Merge a batch of ticks into StockBar and the daily StockHistoricalData rows.
+
+    Each bar is upserted so concurrent writers merge into the same row:
+    high/low widen, close moves to the latest tick (unless the row already
+    holds a later one) and volume accumulates. Must run in a transaction;
+    the batch's stocks stay locked until it ends.
+    """
+    if not rows:
+        return 0
+    rows = sorted(rows, key=lambda row: row[2])
+    _lock_stocks({stock_id for stock_id, price_data, timestamp in rows})
+    bars = fold_ticks(rows, _booked_volumes(rows))
+
+    greatest, least = _greatest_least()
+    quote = connection.ops.quote_name
+    bar_table = quote(StockBar._meta.db_table)
+    bar_values = []
+    daily_values = []
+    for (stock_id, interval, start), (open_, high, low, close, volume, close_at) in bars.items():
+        start_sql = connection.ops.adapt_datetimefield_value(_from_epoch(start))
+        close_at = connection.ops.adapt_datetimefield_value(close_at)
+        bar_values.append((stock_id, interval, start_sql, open_, high, low, close, volume, close_at))
+        if interval == '1d':
+            daily_values.append((stock_id, _from_epoch(start).date(), open_, high, low, close, volume, close_at))
+
+    daily_table = quote(StockHistoricalData._meta.db_table)
+    with connection.cursor() as cursor:
+        upsert(
+            cursor,
+            f'INSERT INTO {bar_table} (stock_id, "interval", "start", open_price, high_price, low_price, close_price, volume, close_at)',
+            f"""ON CONFLICT (stock_id, "interval", "start") DO UPDATE SET
+                high_price = {greatest}({bar_table}.high_price, EXCLUDED.high_price),
+                low_price = {least}({bar_table}.low_price, EXCLUDED.low_price),
+                {_latest_close(bar_table)},
+                volume = CASE WHEN {bar_table}."interval" = '1d'
+                    THEN {greatest}({bar_table}.volume, EXCLUDED.volume)
+                    ELSE {bar_table}.volume + EXCLUDED.volume END""",
+            bar_values,
+        )
+        upsert(
+            cursor,
+            f'INSERT INTO {daily_table} (stock_id, date, open_price, high_price, low_price, close_price, volume, close_at)',
+            f"""ON CONFLICT (stock_id, date) DO UPDATE SET
+                high_price = {greatest}({daily_table}.high_price, EXCLUDED.high_price),
+                low_price = {least}({daily_table}.low_price, EXCLUDED.low_price),
+                {_latest_close(daily_table)},
+                volume = {greatest}({daily_table}.volume, EXCLUDED.volume)""",
+            daily_values,
+        )
+    return len(bars)
@@ -1,8 +1,30 @@
 from rest_framework import serializers
-from .models import Stock, StockPrice, StockHistoricalData
+from .models import Stock, StockPrice, StockHistoricalData, StockBar, LatestQuote
 
 
-class StockSerializer(serializers.ModelSerializer):
+class LatestQuoteMixin:
+    """Price fields read from ``Stock.latest_quote``.
+
+    Querysets should use ``select_related('latest_quote')`` so a page of
+    stocks costs one query rather than one per stock.
+    """
+
+    def _latest_quote(self, obj):
+        try:
+            return obj.latest_quote
+        except LatestQuote.DoesNotExist:
+            return None
+
+    def get_latest_price(self, obj):
+        latest_quote = self._latest_quote(obj)
+        return float(latest_quote.price) if latest_quote else None
+
+    def get_change_percent(self, obj):
+        latest_quote = self._latest_quote(obj)
+        return float(latest_quote.change_percent) if latest_quote and latest_quote.change_percent is not None else None
+
+
+class StockSerializer(LatestQuoteMixin, serializers.ModelSerializer):
     latest_price = serializers.SerializerMethodField()
     change_percent = serializers.SerializerMethodField()
 
@@ -11,14 +33,6 @@ class StockSerializer(serializers.ModelSerializer):
         fields = ['id', 'symbol', 'name', 'sector', 'industry', 'market_cap', 
                  'is_active', 'latest_price', 'change_percent', 'created_at', 'updated_at']
 
-    def get_latest_price(self, obj):
-        latest_price = obj.prices.first()
-        return float(latest_price.price) if latest_price else None
-
-    def get_change_percent(self, obj):
-        latest_price = obj.prices.first()
-        return float(latest_price.change_percent) if latest_price and latest_price.change_percent else None
-
 
 class StockPriceSerializer(serializers.ModelSerializer):
     stock_symbol = serializers.CharField(source='stock.symbol', read_only=True)
@@ -38,19 +52,16 @@ class StockHistoricalDataSerializer(serializers.ModelSerializer):
                  'close_price', 'volume', 'adjusted_close']
 
 
-class StockListSerializer(serializers.ModelSerializer):
+class StockBarSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StockBar
+        fields = ['interval', 'start', 'open_price', 'high_price', 'low_price', 'close_price', 'volume']
+
+
+class StockListSerializer(LatestQuoteMixin, serializers.ModelSerializer):
     latest_price = serializers.SerializerMethodField()
     change_percent = serializers.SerializerMethodField()
 
     class Meta:
         model = Stock
         fields = ['id', 'symbol', 'name', 'latest_price', 'change_percent']
-
-    def get_latest_price(self, obj):
-        latest_price = obj.prices.first()
-        return float(latest_price.price) if latest_price else None
-
-    def get_change_percent(self, obj):
-        latest_price = obj.prices.first()
-        return float(latest_price.change_percent) if latest_price and latest_price.change_percent else None
-
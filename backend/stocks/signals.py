@@ -0,0 +1,37 @@
+import copy
+import logging
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .leaderboard import remove_from_leaderboard
+from .models import Stock
+from .symbols import get_symbol_cache
+
+logger = logging.getLogger(__name__)
+
+
+def publish_stock_change(stock, deleted=False):
+    """Apply a committed Stock change to the symbol caches and the leaderboard"""
+    try:
+        get_symbol_cache().stock_changed(stock, deleted=deleted)
+    except Exception as e:
+        logger.error(f"Error recording change of stock {stock.id}: {str(e)}")
+    if deleted or not stock.is_active:
+        try:
+            remove_from_leaderboard(stock.id)
+        except Exception as e:
+            logger.error(f"Error removing stock {stock.id} from the leaderboard: {str(e)}")
+
+
+@receiver(post_save, sender=Stock)
+def stock_saved(sender, instance, **kwargs):
+    # The instance may change again before the transaction commits
+    stock = copy.copy(instance)
+    transaction.on_commit(lambda: publish_stock_change(stock))
+
+
+@receiver(post_delete, sender=Stock)
+def stock_deleted(sender, instance, **kwargs):
+    # delete() clears the instance's id once the signals have run
+    stock = copy.copy(instance)
+    transaction.on_commit(lambda: publish_stock_change(stock, deleted=True))
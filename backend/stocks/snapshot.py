@@ -0,0 +1,70 @@
+import asyncio
+import json
+import time
+from collections import namedtuple
+from django.conf import settings
+from .leaderboard import ENTRIES_KEY, arebuild_leaderboard
+from .redis_client import get_async_redis
+from .replay import SEQ_KEY
+
+# ``stocks`` for per-connection encoders, ``text`` as the ready JSON frame and
+# ``seq`` as the stream position clients resume from
+Snapshot = namedtuple('Snapshot', ['stocks', 'seq', 'text'])
+
+
+async def _read_state():
+    pipe = get_async_redis().pipeline(transaction=True)
+    pipe.get(SEQ_KEY)
+    pipe.hvals(ENTRIES_KEY)
+    seq, entries = await pipe.execute()
+    return int(seq or 0), [json.loads(entry) for entry in entries]
+
+
+async def build_snapshot():
+    """Read every stock's latest broadcast from Redis and encode the frame once"""
+    seq, stocks = await _read_state()
+    if not stocks and await arebuild_leaderboard():
+        # Redis lost the state; reload it from LatestQuote once for everyone
+        seq, stocks = await _read_state()
+    stocks.sort(key=lambda stock: stock['symbol'])
+    return Snapshot(stocks, seq, json.dumps({'type': 'initial_data', 'data': stocks, 'seq': seq}))
+
+
+class SnapshotCache:
+    """Process-wide initial_data snapshot shared by every websocket connection.
+
+    Ingestion keeps the latest state of each stock in Redis; the snapshot
+    is rebuilt from there at most every ``max_age`` seconds. Connections
+    that arrive while a build is running wait for that build, so a
+    reconnect storm costs one Redis read per ``max_age`` and no database
+    access.
+    """
+
+    def __init__(self, max_age):
+        self.max_age = max_age
+        self._snapshot = None
+        self._built_at = 0
+        self._building = None
+
+    async def get(self):
+        if self._snapshot is not None and time.monotonic() - self._built_at < self.max_age:
+            return self._snapshot
+        if self._building is None:
+            self._building = asyncio.ensure_future(self._build())
+        return await asyncio.shield(self._building)
+
+    async def _build(self):
+        try:
+            snapshot = await build_snapshot()
+            self._snapshot = snapshot
+            self._built_at = time.monotonic()
+            return snapshot
+        finally:
+            self._building = None
+
+
+_snapshot_cache = SnapshotCache(max_age=settings.WEBSOCKET_SNAPSHOT_MAX_AGE)
+
+
+def get_snapshot_cache():
+    return _snapshot_cache
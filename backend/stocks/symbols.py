@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import namedtuple
+from django.conf import settings
+from django.core.cache import cache
+from .models import Stock
+
+# Just enough of a Stock for ingestion to write ticks and build broadcasts
+StockRef = namedtuple('StockRef', ['id', 'symbol', 'name'])
+
+VERSION_KEY = 'stocks:symbol_cache:version'
+
+
+class SymbolCache:
+    """Process-local symbol -> StockRef map for ingestion workers.
+
+    The map is loaded with one query and kept up to date by the Stock
+    signals in ``stocks.signals``. Other processes learn about changes via a
+    version counter in the shared cache, checked at most every
+    ``check_interval`` seconds.
+    """
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self._refs = None
+        self._version = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def warm(self):
+        version = cache.get(VERSION_KEY, 0)
+        refs = {
+            symbol: StockRef(pk, symbol, name)
+            for pk, symbol, name in Stock.objects.values_list('id', 'symbol', 'name')
+        }
+        with self._lock:
+            self._refs = refs
+            self._version = version
+            self._checked_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._refs is None:
+            self.warm()
+        elif time.monotonic() - self._checked_at >= self.check_interval:
+            self._checked_at = time.monotonic()
+            if cache.get(VERSION_KEY, 0) != self._version:
+                self.warm()
+
+    def get(self, symbol):
+        """Return the StockRef for ``symbol``, creating the Stock if it is new"""
+        self._ensure_fresh()
+        ref = self._refs.get(symbol)
+        if ref is None:
+            stock, created = Stock.objects.get_or_create(
+                symbol=symbol,
+                defaults={'name': symbol, 'is_active': True}
+            )
+            ref = self._store(stock)
+        return ref
+
+    def get_many(self, symbols):
+        """Return ``{symbol: StockRef}``, creating any Stocks that are new"""
+        self._ensure_fresh()
+        refs = {symbol: self._refs.get(symbol) for symbol in symbols}
+        missing = [symbol for symbol, ref in refs.items() if ref is None]
+        if missing:
+            Stock.objects.bulk_create(
+                [Stock(symbol=symbol, name=symbol, is_active=True) for symbol in missing],
+                ignore_conflicts=True,
+            )
+            for stock in Stock.objects.filter(symbol__in=missing):
+                refs[stock.symbol] = self._store(stock)
+        return refs
+
+    def _store(self, stock):
+        ref = StockRef(stock.id, stock.symbol, stock.name)
+        with self._lock:
+            if self._refs is not None:
+                self._refs[stock.symbol] = ref
+        return ref
+
+    def stock_changed(self, stock, deleted=False):
+        """Apply a Stock change locally and tell other processes to reload"""
+        with self._lock:
+            if self._refs is not None:
+                # Drop any entry still pointing at this row (e.g. a renamed symbol)
+                for symbol, ref in list(self._refs.items()):
+                    if ref.id == stock.id:
+                        del self._refs[symbol]
+                if not deleted:
+                    self._refs[stock.symbol] = StockRef(stock.id, stock.symbol, stock.name)
+
+        try:
+            version = cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, 1, None)
+            version = 1
+        with self._lock:
+            # Nothing else changed in between, so there is no need to reload
+            if self._version == version - 1:
+                self._version = version
+
+
+_symbol_cache = SymbolCache(check_interval=settings.SYMBOL_CACHE_CHECK_INTERVAL)
+
+
+def get_symbol_cache():
+    return _symbol_cache
@@ -1,15 +1,20 @@
 from celery import shared_task
+from celery.signals import worker_process_init, worker_process_shutdown
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
 from django.core.cache import cache
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-import requests
 import logging
-from .models import Stock, StockPrice
-from decouple import config
-import time
+from .buffer import flush_tick_buffer
+from .models import Stock, StockPrice, StockBar
+from .partitions import drop_old_partitions, ensure_partitions, is_partitioned
+from .ingestion import ingest_quote, ingest_quotes
+from .providers import get_provider
+from .ratelimit import get_quote_bucket
+from .redis_client import get_redis
+from .symbols import get_symbol_cache
 
 logger = logging.getLogger(__name__)
-channel_layer = get_channel_layer()
 
 # List of 5 stocks to track (matching the original server.js)
 STOCK_SYMBOLS = ["AAPL", "GOOGL", "MSFT", "AMZN", "TSLA"]
@@ -59,117 +64,140 @@ STOCK_SYMBOLS = ["AAPL", "GOOGL", "MSFT", "AMZN", "TSLA"]
 #     'SPYQ', 'SPYR', 'SPYS', 'SPYT', 'SPYU', 'SPYV', 'SPYW', 'SPYX', 'SPYY', 'SPYZ'
 # ]
 
+@worker_process_init.connect
+def warm_symbol_cache(**kwargs):
+    """Load the symbol -> stock map before the first tick arrives"""
+    try:
+        get_symbol_cache().warm()
+    except Exception as e:
+        logger.error(f"Error warming symbol cache: {str(e)}")
+
+
+@worker_process_shutdown.connect
+def flush_buffered_ticks(**kwargs):
+    """Write out buffered ticks before a worker process exits"""
+    flush_tick_buffer()
+
+
+SCHEDULE_CURSOR_KEY = 'stocks:schedule:cursor'
+
+
+def get_tracked_symbols():
+    """Symbols to keep fresh: the default list plus every active stock"""
+    active = Stock.objects.filter(is_active=True).values_list('symbol', flat=True)
+    return list(dict.fromkeys([*STOCK_SYMBOLS, *active]))
+
+
 @shared_task
 def fetch_stock_data_task():
-    """Fetch stock data for all stocks"""
+    """Schedule quote fetches for all tracked stocks.
+
+    Slots come from the Redis token bucket shared by every worker, so each
+    fetch is queued with a countdown instead of sleeping between requests.
+    Symbols that do not fit in this cycle's horizon are picked up first on
+    the next cycle.
+    """
     logger.info("Starting stock data fetch task")
     
-    api_key = config('ALPHA_VANTAGE_API_KEY')
-    if not api_key:
-        logger.error("Alpha Vantage API key not configured")
+    provider = get_provider()
+    if not provider.is_configured():
+        logger.error(f"Market data provider '{provider.name}' is not configured")
         return
     
-    # Process stocks one by one with 12-second delays to respect rate limits
-    # (5 requests per minute = 12 seconds apart)
-    for i, symbol in enumerate(STOCK_SYMBOLS):
-        try:
-            fetch_single_stock_data.delay(symbol)
-            # Wait 12 seconds between requests (except for the last one)
-            if i < len(STOCK_SYMBOLS) - 1:
-                time.sleep(12)
-        except Exception as e:
-            logger.error(f"Error scheduling fetch for {symbol}: {str(e)}")
+    symbols = get_tracked_symbols()
+    if not symbols:
+        return
+    
+    redis = get_redis()
+    cursor = int(redis.get(SCHEDULE_CURSOR_KEY) or 0) % len(symbols)
+    ordered = symbols[cursor:] + symbols[:cursor]
     
-    logger.info("Stock data fetch task completed")
+    delays = get_quote_bucket().reserve(len(ordered), settings.QUOTE_SCHEDULE_HORIZON)
+    if settings.QUOTE_INGESTION_MODE == 'batch':
+        schedule_batches(ordered[:len(delays)], delays)
+    else:
+        for symbol, delay in zip(ordered, delays):
+            try:
+                fetch_single_stock_data.apply_async(args=[symbol], countdown=delay)
+            except Exception as e:
+                logger.error(f"Error scheduling fetch for {symbol}: {str(e)}")
+    
+    redis.set(SCHEDULE_CURSOR_KEY, (cursor + len(delays)) % len(symbols))
+    logger.info(f"Scheduled {len(delays)} of {len(symbols)} stock fetches")
 
 @shared_task
 def fetch_single_stock_data(symbol):
     """Fetch data for a single stock"""
     try:
-        api_key = config('ALPHA_VANTAGE_API_KEY')
-        
-        # Fetch current quote
-        quote_url = "https://www.alphavantage.co/query"
-        quote_params = {
-            'function': 'GLOBAL_QUOTE',
-            'symbol': symbol,
-            'apikey': api_key
-        }
-        
-        response = requests.get(quote_url, params=quote_params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        price_data = get_provider().fetch_quote(symbol)
         
-        if 'Global Quote' in data and data['Global Quote']:
-            quote_data = data['Global Quote']
-            
-            # Get or create stock
-            stock, created = Stock.objects.get_or_create(
-                symbol=symbol,
-                defaults={'name': symbol, 'is_active': True}
-            )
-            
-            # Create price record
-            price_data = {
-                'price': float(quote_data.get('05. price', 0)),
-                'volume': int(quote_data.get('06. volume', 0)),
-                'open_price': float(quote_data.get('02. open', 0)),
-                'high_price': float(quote_data.get('03. high', 0)),
-                'low_price': float(quote_data.get('04. low', 0)),
-                'previous_close': float(quote_data.get('08. previous close', 0)),
-                'change': float(quote_data.get('09. change', 0)),
-                'change_percent': float(quote_data.get('10. change percent', 0).rstrip('%'))
-            }
-            
-            StockPrice.objects.create(stock=stock, **price_data)
-            
-            # Send WebSocket update
-            send_stock_update(stock, price_data)
-            
-            logger.info(f"Updated {symbol}: ${price_data['price']}")
-            
+        if price_data:
+            if ingest_quote(symbol, price_data):
+                logger.info(f"Updated {symbol}: ${price_data['price']}")
+            else:
+                logger.info(f"No change for {symbol}")
         else:
             logger.warning(f"No data received for {symbol}")
             
     except Exception as e:
         logger.error(f"Error fetching data for {symbol}: {str(e)}")
 
-def send_stock_update(stock, price_data):
-    """Send stock update via WebSocket"""
+def schedule_batches(symbols, delays):
+    """Queue one batch task per QUOTE_BATCH_SIZE symbols.
+
+    Each batch runs at the time of its last reserved slot, so its
+    concurrent requests never run ahead of the shared quota.
+    """
+    size = max(1, settings.QUOTE_BATCH_SIZE)
+    for start in range(0, len(symbols), size):
+        batch = symbols[start:start + size]
+        countdown = delays[start + len(batch) - 1]
+        try:
+            fetch_stock_batch.apply_async(args=[batch], countdown=countdown)
+        except Exception as e:
+            logger.error(f"Error scheduling batch fetch for {len(batch)} symbols: {str(e)}")
+
+
+@shared_task
+def fetch_stock_batch(symbols):
+    """Fetch and ingest a batch of symbols as one unit of work"""
     try:
-        from .serializers import StockListSerializer
-        
-        # Prepare data for WebSocket
-        stock_data = {
-            'id': stock.id,
-            'symbol': stock.symbol,
-            'name': stock.name,
-            'latest_price': price_data['price'],
-            'change_percent': price_data['change_percent']
-        }
-        
-        # Send to WebSocket group
-        async_to_sync(channel_layer.group_send)(
-            'stock_updates',
-            {
-                'type': 'stock_update',
-                'data': stock_data
-            }
-        )
+        quotes = get_provider().fetch_quotes(symbols)
+        updated = ingest_quotes(quotes)
+        logger.info(f"Updated {len(updated)} of {len(symbols)} stocks in batch")
     except Exception as e:
-        logger.error(f"Error sending WebSocket update for {stock.symbol}: {str(e)}")
+        logger.error(f"Error ingesting batch of {len(symbols)} symbols: {str(e)}")
+
+@shared_task
+def maintain_price_partitions():
+    """Create StockPrice partitions ahead of time"""
+    if not is_partitioned():
+        return
+    
+    created = ensure_partitions(settings.PRICE_PARTITION_PREMAKE_DAYS)
+    if created:
+        logger.info(f"Created price partitions: {', '.join(created)}")
 
 @shared_task
 def cleanup_old_prices():
     """Clean up old price data to keep database size manageable"""
-    from datetime import datetime, timedelta
+    retention_days = settings.PRICE_RETENTION_DAYS
+    
+    # Intraday bars are kept longer than ticks; hourly and daily bars are kept
+    bar_cutoff = timezone.now() - timedelta(days=settings.INTRADAY_BAR_RETENTION_DAYS)
+    deleted_bars = StockBar.objects.filter(interval__in=['1m', '5m'], start__lt=bar_cutoff).delete()[0]
+    logger.info(f"Cleaned up {deleted_bars} old intraday bars")
     
-    # Keep only last 7 days of price data
-    cutoff_date = datetime.now() - timedelta(days=7)
+    if is_partitioned():
+        # Drop whole partitions instead of deleting rows
+        dropped, stragglers = drop_old_partitions(retention_days)
+        logger.info(f"Dropped {len(dropped)} old price partitions and {stragglers} stray rows")
+        return
+    
+    cutoff_date = timezone.now() - timedelta(days=retention_days)
     
     deleted_count = StockPrice.objects.filter(
         timestamp__lt=cutoff_date
     ).delete()[0]
     
     logger.info(f"Cleaned up {deleted_count} old price records")
-
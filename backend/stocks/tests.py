@@ -0,0 +1,60 @@
+import unittest
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from .models import Stock, StockPrice
+from .partitions import TABLE, ensure_partitions, is_partitioned, list_partitions, partition_name
+
+
+def partition_of(price):
+    """Name of the partition a StockPrice row is stored in"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT tableoid::regclass::text FROM "{TABLE}" WHERE id = %s', [price.id])
+        return cursor.fetchone()[0].strip('"')
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'StockPrice is only partitioned on PostgreSQL')
+class EnsurePartitionsTests(TestCase):
+    def setUp(self):
+        self.assertTrue(is_partitioned())
+        self.stock = Stock.objects.create(symbol='AAPL', name='Apple')
+        self.today = timezone.now().date()
+
+    def add_price(self, day, hour=12):
+        timestamp = datetime.combine(day, time(hour), tzinfo=dt_timezone.utc)
+        return StockPrice.objects.create(stock=self.stock, price=100, timestamp=timestamp)
+
+    def test_creates_partitions_ahead(self):
+        far = self.today + timedelta(days=20)
+        self.assertNotIn(far, list_partitions())
+
+        created = ensure_partitions(20)
+
+        self.assertIn(partition_name(far), created)
+        self.assertEqual(partition_of(self.add_price(far)), partition_name(far))
+
+    def test_moves_rows_out_of_the_default_partition(self):
+        # The maintenance task was down: today's partition is missing and
+        # today's rows (and some from a while back) went to the default
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE "{partition_name(self.today)}"')
+        old_day = self.today - timedelta(days=20)
+        prices = [self.add_price(self.today, hour) for hour in (0, 12, 23)] + [self.add_price(old_day)]
+        for price in prices:
+            self.assertEqual(partition_of(price), f'{TABLE}_default')
+
+        created = ensure_partitions(1)
+
+        self.assertIn(partition_name(self.today), created)
+        self.assertIn(partition_name(old_day), created)
+        for price in prices[:3]:
+            self.assertEqual(partition_of(price), partition_name(self.today))
+        self.assertEqual(partition_of(prices[3]), partition_name(old_day))
+        self.assertEqual(StockPrice.objects.filter(stock=self.stock).count(), 4)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM "{TABLE}_default"')
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+        # New rows for those days are routed to the new partitions
+        self.assertEqual(partition_of(self.add_price(self.today)), partition_name(self.today))
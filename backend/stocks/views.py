@@ -1,11 +1,13 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.permissions import IsAdminUser
 from django.db.models import Q
-from django.core.cache import cache
-from .models import Stock, StockPrice, StockHistoricalData
-from .serializers import StockSerializer, StockPriceSerializer, StockHistoricalDataSerializer, StockListSerializer
+from .models import Stock, StockPrice, StockHistoricalData, StockBar
+from .serializers import StockSerializer, StockPriceSerializer, StockHistoricalDataSerializer, StockListSerializer, StockBarSerializer
 from .tasks import fetch_stock_data_task
+from .leaderboard import get_leaderboard, rebuild_leaderboard
+from .connections import get_connection_stats
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,7 +23,7 @@ class StockViewSet(viewsets.ReadOnlyModelViewSet):
         return StockSerializer
 
     def get_queryset(self):
-        queryset = Stock.objects.filter(is_active=True)
+        queryset = Stock.objects.filter(is_active=True).select_related('latest_quote')
         
         # Search functionality
         search = self.request.query_params.get('search', None)
@@ -48,8 +50,9 @@ class StockViewSet(viewsets.ReadOnlyModelViewSet):
         """Get price history for a specific stock"""
         stock = self.get_object()
         limit = request.query_params.get('limit', 100)
+        days = request.query_params.get('days')
         
-        prices = stock.prices.all()[:int(limit)]
+        prices = stock.prices.recent(int(days) if days else None)[:int(limit)]
         serializer = StockPriceSerializer(prices, many=True)
         return Response(serializer.data)
 
@@ -63,6 +66,23 @@ class StockViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = StockHistoricalDataSerializer(historical_data, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def bars(self, request, pk=None):
+        """Get OHLCV bars for a specific stock at a given interval"""
+        stock = self.get_object()
+        interval = request.query_params.get('interval', '1d')
+        limit = request.query_params.get('limit', 500)
+        
+        if interval not in dict(StockBar.INTERVALS):
+            return Response(
+                {'error': f"interval must be one of {', '.join(dict(StockBar.INTERVALS))}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        bars = stock.bars.filter(interval=interval)[:int(limit)]
+        serializer = StockBarSerializer(bars, many=True)
+        return Response(serializer.data)
+
     @action(detail=False, methods=['post'])
     def refresh_all(self, request):
         """Trigger refresh of all stock data"""
@@ -77,52 +97,39 @@ class StockViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def top_gainers(self, request):
         """Get top gaining stocks"""
-        cache_key = 'top_gainers'
-        cached_data = cache.get(cache_key)
+        data = get_leaderboard('gainers')
         
-        if cached_data:
-            return Response(cached_data)
+        # Leaderboard is maintained by ingestion; reload it if Redis lost it
+        if not data and rebuild_leaderboard():
+            data = get_leaderboard('gainers')
         
-        stocks = Stock.objects.filter(
-            is_active=True,
-            prices__change_percent__isnull=False
-        ).order_by('-prices__change_percent')[:10]
-        
-        serializer = StockListSerializer(stocks, many=True)
-        data = serializer.data
-        
-        # Cache for 5 minutes
-        cache.set(cache_key, data, 300)
         return Response(data)
 
     @action(detail=False, methods=['get'])
     def top_losers(self, request):
         """Get top losing stocks"""
-        cache_key = 'top_losers'
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return Response(cached_data)
+        data = get_leaderboard('losers')
         
-        stocks = Stock.objects.filter(
-            is_active=True,
-            prices__change_percent__isnull=False
-        ).order_by('prices__change_percent')[:10]
+        # Leaderboard is maintained by ingestion; reload it if Redis lost it
+        if not data and rebuild_leaderboard():
+            data = get_leaderboard('losers')
         
-        serializer = StockListSerializer(stocks, many=True)
-        data = serializer.data
-        
-        # Cache for 5 minutes
-        cache.set(cache_key, data, 300)
         return Response(data)
 
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def connections(self, request):
+        """Get live websocket connection and subscription counts"""
+        return Response(get_connection_stats())
+
+
 class StockPriceViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = StockPrice.objects.all()
     serializer_class = StockPriceSerializer
 
     def get_queryset(self):
-        queryset = StockPrice.objects.all()
+        days = self.request.query_params.get('days')
+        queryset = StockPrice.objects.recent(int(days) if days else None)
         
         # Filter by stock symbol
         symbol = self.request.query_params.get('symbol', None)
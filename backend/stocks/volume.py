@@ -0,0 +1,113 @@
+import math
+import threading
+import time
+from array import array
+from collections import namedtuple
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .models import StockPrice
+
+# ``ratio`` is the tick's volume rate as a multiple of the baseline mean,
+# ``zscore`` how many standard deviations it sits above it
+VolumeSignal = namedtuple('VolumeSignal', ['ratio', 'zscore'])
+
+# Per-stock slot layout in VolumeBaseline._state
+LAST_VOLUME, LAST_TIME, MEAN, VARIANCE, SAMPLES = range(5)
+SLOT_SIZE = 5
+
+
+class VolumeBaseline:
+    """Rolling per-stock baseline of traded volume, updated in O(1) per tick.
+
+    Quotes carry the session's cumulative volume, so each tick contributes
+    the shares traded since the previous one divided by the time between
+    them. The mean and variance of that rate are exponentially weighted
+    with time constant ``window`` seconds, which keeps the estimate
+    independent of how often a symbol is polled.
+
+    State is five doubles per stock in one flat array. It is rebuilt from
+    the last few windows of StockPrice ticks when the process starts.
+    """
+
+    def __init__(self, window, min_samples):
+        self.window = window
+        self.min_samples = min_samples
+        self._state = None
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    def warm(self):
+        since = timezone.now() - timedelta(seconds=self.window * 3)
+        ticks = (
+            StockPrice.objects.filter(timestamp__gte=since, volume__isnull=False)
+            .order_by('stock_id', 'timestamp')
+            .values_list('stock_id', 'volume', 'timestamp')
+        )
+        with self._lock:
+            self._state = array('d')
+            self._slots = {}
+            for stock_id, volume, timestamp in ticks.iterator(chunk_size=10000):
+                self._update(stock_id, volume, timestamp.timestamp())
+
+    def update(self, stock_id, volume, now=None):
+        """Fold a tick's cumulative ``volume`` into the baseline.
+
+        Returns the tick's VolumeSignal against the baseline as it stood
+        before the tick, or ``None`` while the baseline is still warming up.
+        """
+        if volume is None:
+            return None
+        if self._state is None:
+            self.warm()
+        with self._lock:
+            return self._update(stock_id, volume, now or time.time())
+
+    def _update(self, stock_id, volume, now):
+        state = self._state
+        slot = self._slots.get(stock_id)
+        if slot is None:
+            slot = self._slots[stock_id] = len(state)
+            state.extend((volume, now, 0.0, 0.0, 0.0))
+            return None
+
+        elapsed = now - state[slot + LAST_TIME]
+        if elapsed <= 0:
+            return None
+        last_volume = state[slot + LAST_VOLUME]
+        # Cumulative volume resets when a new session starts
+        traded = volume - last_volume if volume >= last_volume else volume
+        rate = traded / elapsed
+        state[slot + LAST_VOLUME] = volume
+        state[slot + LAST_TIME] = now
+
+        mean = state[slot + MEAN]
+        variance = state[slot + VARIANCE]
+        samples = state[slot + SAMPLES]
+        signal = None
+        if samples >= self.min_samples and mean > 0:
+            zscore = (rate - mean) / math.sqrt(variance) if variance > 0 else 0.0
+            signal = VolumeSignal(rate / mean, zscore)
+
+        if samples == 0:
+            mean, variance = rate, 0.0
+        else:
+            alpha = 1 - math.exp(-elapsed / self.window)
+            diff = rate - mean
+            increment = alpha * diff
+            mean += increment
+            variance = (1 - alpha) * (variance + diff * increment)
+        state[slot + MEAN] = mean
+        state[slot + VARIANCE] = variance
+        state[slot + SAMPLES] = samples + 1
+        return signal
+
+
+_volume_baseline = VolumeBaseline(
+    window=settings.VOLUME_BASELINE_WINDOW,
+    min_samples=settings.VOLUME_BASELINE_MIN_SAMPLES,
+)
+
+
+def get_volume_baseline():
+    return _volume_baseline
@@ -18,7 +18,11 @@ app.autodiscover_tasks()
 app.conf.beat_schedule = {
     'fetch-stock-data': {
         'task': 'stocks.tasks.fetch_stock_data_task',
-        'schedule': 60.0,  # Run every minute (5 stocks = 1 minute total)
+        'schedule': 60.0,  # Run every minute; fetches are spread out by the rate limiter
+    },
+    'maintain-price-partitions': {
+        'task': 'stocks.tasks.maintain_price_partitions',
+        'schedule': 3600.0,  # Run hourly
     },
     'cleanup-old-prices': {
         'task': 'stocks.tasks.cleanup_old_prices',
@@ -19,7 +19,6 @@ ALLOWED_HOSTS = ['localhost', '127.0.0.1', '0.0.0.0']
 
 # Application definition
 INSTALLED_APPS = [
-    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -137,9 +136,12 @@ REST_FRAMEWORK = {
 }
 
 # Channels
+# The pub/sub layer publishes each group message once and lets every ASGI
+# process deliver it to its own sockets; channels_redis.core.RedisChannelLayer
+# instead writes one message per connection into Redis
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'BACKEND': config('CHANNEL_LAYER_BACKEND', default='channels_redis.pubsub.RedisPubSubChannelLayer'),
         'CONFIG': {
             "hosts": [config('REDIS_URL', default='redis://localhost:6379')],
         },
@@ -157,6 +159,90 @@ CELERY_TIMEZONE = TIME_ZONE
 # Alpha Vantage API
 ALPHA_VANTAGE_API_KEY = config('ALPHA_VANTAGE_API_KEY', default='')
 
+# Market data source: 'alphavantage', or 'synthetic' / 'replay' for load tests
+MARKET_DATA_PROVIDER = config('MARKET_DATA_PROVIDER', default='alphavantage')
+MARKET_DATA_REPLAY_FILE = config('MARKET_DATA_REPLAY_FILE', default='')
+
+# Redis connection used for shared ingestion state (rate limits, cursors)
+REDIS_URL = config('REDIS_URL', default='redis://localhost:6379')
+
+# Quote scheduler: a token bucket in Redis shared by every worker.
+# Alpha Vantage's free tier allows 5 requests per minute.
+QUOTE_RATE_LIMIT = config('QUOTE_RATE_LIMIT', default=5, cast=int)
+QUOTE_RATE_PERIOD = config('QUOTE_RATE_PERIOD', default=60.0, cast=float)
+QUOTE_RATE_BURST = config('QUOTE_RATE_BURST', default=1, cast=int)
+# How far ahead (seconds) a beat cycle may book slots; should match the beat interval
+QUOTE_SCHEDULE_HORIZON = config('QUOTE_SCHEDULE_HORIZON', default=60.0, cast=float)
+# 'single' runs one task per symbol; 'batch' fetches QUOTE_BATCH_SIZE symbols
+# per task concurrently over a pooled keep-alive session
+QUOTE_INGESTION_MODE = config('QUOTE_INGESTION_MODE', default='single')
+QUOTE_BATCH_SIZE = config('QUOTE_BATCH_SIZE', default=50, cast=int)
+QUOTE_FETCH_CONCURRENCY = config('QUOTE_FETCH_CONCURRENCY', default=8, cast=int)
+
+# Skip persisting/broadcasting quotes identical to the last one for a symbol,
+# but still let one through every QUOTE_HEARTBEAT_INTERVAL seconds
+QUOTE_CHANGE_DETECTION = config('QUOTE_CHANGE_DETECTION', default=True, cast=bool)
+QUOTE_HEARTBEAT_INTERVAL = config('QUOTE_HEARTBEAT_INTERVAL', default=300, cast=int)
+
+# StockPrice retention; on PostgreSQL ticks live in daily partitions that are
+# created PRICE_PARTITION_PREMAKE_DAYS ahead and dropped after retention
+PRICE_RETENTION_DAYS = config('PRICE_RETENTION_DAYS', default=7, cast=int)
+PRICE_PARTITION_PREMAKE_DAYS = config('PRICE_PARTITION_PREMAKE_DAYS', default=7, cast=int)
+# 1m/5m OHLCV bars rolled up from ticks; 1h/1d bars are kept indefinitely
+INTRADAY_BAR_RETENTION_DAYS = config('INTRADAY_BAR_RETENTION_DAYS', default=30, cast=int)
+
+# Ingestion workers index active alerts in memory; they apply alert changes
+# from a Redis stream of ALERT_ENGINE_STREAM_SIZE entries at most every
+# ALERT_ENGINE_SYNC_INTERVAL seconds
+ALERT_ENGINE_SYNC_INTERVAL = config('ALERT_ENGINE_SYNC_INTERVAL', default=1.0, cast=float)
+ALERT_ENGINE_STREAM_SIZE = config('ALERT_ENGINE_STREAM_SIZE', default=100000, cast=int)
+
+# Triggered alerts are emailed by Celery tasks of up to
+# ALERT_NOTIFICATION_BATCH_SIZE alerts, each over a single connection. A
+# batch that fails to send is retried up to ALERT_NOTIFICATION_MAX_RETRIES
+# times, ALERT_NOTIFICATION_RETRY_DELAY seconds later, doubling each time
+ALERT_NOTIFICATION_BATCH_SIZE = config('ALERT_NOTIFICATION_BATCH_SIZE', default=500, cast=int)
+ALERT_NOTIFICATION_MAX_RETRIES = config('ALERT_NOTIFICATION_MAX_RETRIES', default=5, cast=int)
+ALERT_NOTIFICATION_RETRY_DELAY = config('ALERT_NOTIFICATION_RETRY_DELAY', default=60, cast=int)
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='alerts@stocktracker.local')
+
+# Volume-spike baseline: EWMA of each stock's traded volume rate with a
+# VOLUME_BASELINE_WINDOW-second time constant; spikes are only reported once
+# VOLUME_BASELINE_MIN_SAMPLES ticks have been seen
+VOLUME_BASELINE_WINDOW = config('VOLUME_BASELINE_WINDOW', default=1800.0, cast=float)
+VOLUME_BASELINE_MIN_SAMPLES = config('VOLUME_BASELINE_MIN_SAMPLES', default=10, cast=int)
+
+# How often (seconds) ingestion workers check whether their symbol map is stale
+SYMBOL_CACHE_CHECK_INTERVAL = config('SYMBOL_CACHE_CHECK_INTERVAL', default=30.0, cast=float)
+
+# Ingested ticks are written in bulk once TICK_BUFFER_SIZE rows are waiting or
+# the oldest is TICK_BUFFER_MAX_AGE seconds old; COPY is used on PostgreSQL
+TICK_BUFFER_SIZE = config('TICK_BUFFER_SIZE', default=500, cast=int)
+TICK_BUFFER_MAX_AGE = config('TICK_BUFFER_MAX_AGE', default=2.0, cast=float)
+TICK_BUFFER_USE_COPY = config('TICK_BUFFER_USE_COPY', default=True, cast=bool)
+# Ticks held for retry while the database is unavailable, oldest dropped first
+TICK_BUFFER_MAX_PENDING = config('TICK_BUFFER_MAX_PENDING', default=50000, cast=int)
+
+# Websocket send queues: conflate to the latest tick per symbol by default
+# (clients can pass ?conflate=0), and close clients with more than
+# WEBSOCKET_MAX_PENDING queued frames or no progress for WEBSOCKET_MAX_LAG s.
+# Relies on the ASGI server's send waiting for the socket to drain, as
+# uvicorn's websockets implementation does (see stocks.outbox)
+WEBSOCKET_CONFLATE = config('WEBSOCKET_CONFLATE', default=True, cast=bool)
+WEBSOCKET_MAX_PENDING = config('WEBSOCKET_MAX_PENDING', default=1000, cast=int)
+WEBSOCKET_MAX_LAG = config('WEBSOCKET_MAX_LAG', default=10.0, cast=float)
+# How stale the shared initial_data snapshot sent on connect may get
+WEBSOCKET_SNAPSHOT_MAX_AGE = config('WEBSOCKET_SNAPSHOT_MAX_AGE', default=1.0, cast=float)
+# Updates kept in Redis for clients that reconnect with ?last_seq=
+WEBSOCKET_REPLAY_SIZE = config('WEBSOCKET_REPLAY_SIZE', default=10000, cast=int)
+# Server pings every interval; clients silent for WEBSOCKET_IDLE_TIMEOUT
+# seconds are closed (0 disables). WEBSOCKET_MAX_CONNECTIONS caps
+# connections per ASGI process (0 for no cap)
+WEBSOCKET_HEARTBEAT_INTERVAL = config('WEBSOCKET_HEARTBEAT_INTERVAL', default=30.0, cast=float)
+WEBSOCKET_IDLE_TIMEOUT = config('WEBSOCKET_IDLE_TIMEOUT', default=90.0, cast=float)
+WEBSOCKET_MAX_CONNECTIONS = config('WEBSOCKET_MAX_CONNECTIONS', default=0, cast=int)
+
 # Cache configuration
 CACHES = {
     'default': {
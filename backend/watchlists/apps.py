@@ -5,3 +5,6 @@ class WatchlistsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'watchlists'
 
+    def ready(self):
+        from . import signals  # noqa: F401
+
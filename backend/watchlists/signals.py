@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import WatchlistItem
+from .subscriptions import push_watchlist_change
+
+
+@receiver(post_save, sender=WatchlistItem)
+def watchlist_item_saved(sender, instance, created, **kwargs):
+    if created:
+        push_watchlist_change(instance, 'added')
+
+
+@receiver(post_delete, sender=WatchlistItem)
+def watchlist_item_deleted(sender, instance, **kwargs):
+    push_watchlist_change(instance, 'removed')
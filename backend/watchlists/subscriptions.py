@@ -0,0 +1,37 @@
+import logging
+from django.db.models import Q
+from stocks.broadcast import frame, group_send_many
+from stocks.groups import watchlist_group
+from .models import Watchlist
+
+logger = logging.getLogger(__name__)
+
+
+async def watchlist_symbols(watchlist_id, user):
+    """Return the symbols on a watchlist ``user`` may stream, or ``None`` if it is not visible to them.
+
+    Resolved with a single query joining the watchlist to its items' stocks.
+    """
+    visible = Q(is_public=True)
+    if user is not None and user.is_authenticated:
+        visible |= Q(user_id=user.id)
+    rows = [
+        symbol async for symbol in
+        Watchlist.objects.filter(visible, id=watchlist_id).values_list('items__stock__symbol', flat=True)
+    ]
+    if not rows:
+        return None
+    return [symbol for symbol in rows if symbol is not None]
+
+
+def push_watchlist_change(item, action):
+    """Tell connections streaming a watchlist that a symbol was ``'added'`` or ``'removed'``"""
+    try:
+        data = {
+            'watchlist_id': item.watchlist_id,
+            'symbol': item.stock.symbol,
+            'action': action,
+        }
+        group_send_many([(watchlist_group(item.watchlist_id), frame('watchlist_changed', data))])
+    except Exception as e:
+        logger.error(f"Error pushing change to watchlist {item.watchlist_id}: {str(e)}")
@@ -12,7 +12,7 @@ class WatchlistViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Watchlist.objects.filter(user=self.request.user)
+        return Watchlist.objects.filter(user=self.request.user).prefetch_related('items__stock__latest_quote')
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -70,7 +70,7 @@ class WatchlistItemViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return WatchlistItem.objects.filter(watchlist__user=self.request.user)
+        return WatchlistItem.objects.filter(watchlist__user=self.request.user).select_related('stock__latest_quote')
 
     def perform_create(self, serializer):
         watchlist_id = self.request.data.get('watchlist_id')
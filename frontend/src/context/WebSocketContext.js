@@ -15,33 +15,40 @@ export const WebSocketProvider = ({ children }) => {
   const [socket, setSocket] = useState(null);
   const [isConnected, setIsConnected] = useState(false);
   const [stocks, setStocks] = useState({});
+  const [leaderboards, setLeaderboards] = useState(null);
   const [lastUpdate, setLastUpdate] = useState(null);
+  const [alertEvent, setAlertEvent] = useState(null);
   const reconnectTimeoutRef = useRef(null);
   const reconnectAttempts = useRef(0);
+  const lastSeq = useRef(null);
   const maxReconnectAttempts = 5;
 
   const connect = () => {
     try {
-      const ws = new WebSocket('ws://localhost:8000/ws/stocks/');
+      // Subscribe on connect, and resume from the last update seen so a
+      // reconnect only replays the gap
+      const query = lastSeq.current !== null ? `&last_seq=${lastSeq.current}` : '';
+      const ws = new WebSocket(`ws://localhost:8000/ws/stocks/?symbols=all${query}`);
       
       ws.onopen = () => {
         console.log('WebSocket connected');
         setIsConnected(true);
         setSocket(ws);
         reconnectAttempts.current = 0;
-        
-        // Subscribe to all stocks
-        ws.send(JSON.stringify({
-          type: 'subscribe',
-          symbols: ['all']
-        }));
       };
 
       ws.onmessage = (event) => {
         try {
           const data = JSON.parse(event.data);
+          if (data.seq !== undefined) {
+            lastSeq.current = data.seq;
+          } else if (data.data && data.data.seq !== undefined) {
+            lastSeq.current = Math.max(lastSeq.current || 0, data.data.seq);
+          }
           
-          if (data.type === 'initial_data') {
+          if (data.type === 'ping') {
+            ws.send(JSON.stringify({ type: 'pong' }));
+          } else if (data.type === 'initial_data') {
             const stocksData = {};
             data.data.forEach(stock => {
               stocksData[stock.symbol] = stock;
@@ -66,6 +73,31 @@ export const WebSocketProvider = ({ children }) => {
                 }
               );
             }
+          } else if (data.type === 'replay') {
+            setStocks(prevStocks => {
+              const stocksData = { ...prevStocks };
+              data.data.forEach(stock => {
+                stocksData[stock.symbol] = stock;
+              });
+              return stocksData;
+            });
+            setLastUpdate(new Date());
+          } else if (data.type === 'stock_updates_batch') {
+            setStocks(prevStocks => ({
+              ...prevStocks,
+              ...data.data
+            }));
+            setLastUpdate(new Date());
+          } else if (data.type === 'leaderboard_update') {
+            setLeaderboards(data.data);
+          } else if (data.type === 'alert_triggered') {
+            setAlertEvent(data);
+            toast(`${data.data.symbol} alert triggered at $${data.data.triggered_value}`, {
+              duration: 5000,
+              icon: '🔔',
+            });
+          } else if (data.type === 'alert_status') {
+            setAlertEvent(data);
           }
         } catch (error) {
           console.error('Error parsing WebSocket message:', error);
@@ -129,6 +161,16 @@ export const WebSocketProvider = ({ children }) => {
     }
   };
 
+  // Stream a watchlist's symbols; the server follows edits to the watchlist
+  const subscribeToWatchlist = (watchlistId) => {
+    if (socket && isConnected) {
+      socket.send(JSON.stringify({
+        type: 'subscribe_watchlist',
+        watchlist_id: watchlistId
+      }));
+    }
+  };
+
   useEffect(() => {
     connect();
     
@@ -141,9 +183,12 @@ export const WebSocketProvider = ({ children }) => {
     socket,
     isConnected,
     stocks,
+    leaderboards,
     lastUpdate,
+    alertEvent,
     subscribeToStocks,
     unsubscribeFromStocks,
+    subscribeToWatchlist,
     reconnect: connect
   };
 
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import { useQuery, useMutation, useQueryClient } from 'react-query';
 import { Bell, Plus, Trash2, AlertTriangle } from 'lucide-react';
 import { useWebSocket } from '../context/WebSocketContext';
@@ -7,7 +7,7 @@ import toast from 'react-hot-toast';
 import axios from 'axios';
 
 const Alerts = () => {
-  const { stocks } = useWebSocket();
+  const { stocks, alertEvent } = useWebSocket();
   const [searchTerm, setSearchTerm] = useState('');
   const [showAddModal, setShowAddModal] = useState(false);
   const [selectedStock, setSelectedStock] = useState(null);
@@ -21,6 +21,13 @@ const Alerts = () => {
     () => axios.get('/api/alerts/alerts/').then(res => res.data)
   );
 
+  // Alert changes are pushed over the websocket; refetch instead of polling
+  useEffect(() => {
+    if (alertEvent) {
+      queryClient.invalidateQueries('alerts');
+    }
+  }, [alertEvent, queryClient]);
+
   // Fetch all stocks for adding alerts
   const { data: allStocks = [] } = useQuery(
     'all-stocks',
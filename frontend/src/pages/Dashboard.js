@@ -8,11 +8,17 @@ import SearchBar from '../components/SearchBar';
 import { TrendingUp, TrendingDown, Search } from 'lucide-react';
 
 const Dashboard = () => {
-  const { stocks, isConnected } = useWebSocket();
+  const { stocks, leaderboards, isConnected } = useWebSocket();
   const [searchTerm, setSearchTerm] = useState('');
   const [sortBy, setSortBy] = useState('symbol');
   const [filterBy, setFilterBy] = useState('all');
 
+  // Server-ranked leaderboards once pushed, with prices kept live from stock updates
+  const topMovers = (type) => {
+    if (!leaderboards) return Object.values(stocks);
+    return leaderboards[type].map(stock => stocks[stock.symbol] || stock);
+  };
+
   const filteredAndSortedStocks = useMemo(() => {
     let filtered = Object.values(stocks);
 
@@ -87,8 +93,8 @@ const Dashboard = () => {
 
       {/* Top Movers */}
       <div className="grid grid-cols-1 lg:grid-cols-2 gap-6">
-        <TopMovers stocks={Object.values(stocks)} type="gainers" />
-        <TopMovers stocks={Object.values(stocks)} type="losers" />
+        <TopMovers stocks={topMovers('gainers')} type="gainers" />
+        <TopMovers stocks={topMovers('losers')} type="losers" />
       </div>
 
       {/* Filters and Controls */}